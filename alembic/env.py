@@ -1,3 +1,4 @@
+import re
 from logging.config import fileConfig
 
 from sqlalchemy import engine_from_config
@@ -19,6 +20,21 @@ if config.config_file_name is not None:
 from app import models
 target_metadata = models.Base.metadata
 
+# Season partitions (e.g. at_bats_2024) are created by the loaders, not by
+# migrations, along with the indexes and foreign keys Postgres clones onto them
+PARTITION_NAME = re.compile(r"^(at_bat_details|at_bats|pitches)_\d{4}$")
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    if type_ == "table":
+        return not PARTITION_NAME.match(name)
+    if type_ == "index":
+        return not PARTITION_NAME.match(object.table.name)
+    if type_ == "foreign_key_constraint":
+        return not PARTITION_NAME.match(object.referred_table.name)
+    return True
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -41,6 +57,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -64,7 +81,9 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
         )
 
         with context.begin_transaction():
@@ -0,0 +1,274 @@
+"""Partition at_bat_details, at_bats and pitches by season
+
+Revision ID: e7a24c9b5d18
+Revises: d5e8a1f03c27
+Create Date: 2025-04-12 10:14:37.218604
+
+"""
+from typing import List, Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a24c9b5d18'
+down_revision: Union[str, None] = 'd5e8a1f03c27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Referenced tables first
+TABLES = ['at_bat_details', 'at_bats', 'pitches']
+
+INDEXES = {
+    'at_bat_details': [('idx_abdetails_game_mlb_id', ['game_mlb_id'])],
+    'at_bats': [
+        ('idx_at_bat_sport_id', ['sport_id']),
+        ('idx_at_bat_pitcher_id', ['pitcher_id']),
+        ('idx_at_bat_batter_id', ['batter_id']),
+        ('idx_at_bat_pitcher_mlb_id', ['pitcher_mlb_id']),
+        ('idx_at_bat_batter_mlb_id', ['batter_mlb_id']),
+        ('idx_at_bat_game_id', ['game_id']),
+        ('idx_at_bat_game_mlb_id', ['game_mlb_id']),
+        ('idx_at_bat_at_bat_details_id', ['at_bat_details_id']),
+    ],
+    'pitches': [('idx_pitch_at_bat_id', ['at_bat_id'])],
+}
+
+
+def id_column(table_name: str) -> sa.Column:
+    # The new tables keep drawing ids from the existing sequences
+    return sa.Column('id', sa.Integer(), server_default=sa.text(f"nextval('{table_name}_id_seq'::regclass)"), autoincrement=False, nullable=False)
+
+
+def at_bat_details_columns() -> List[sa.Column]:
+    return [
+        sa.Column('game_mlb_id', sa.Integer(), nullable=True),
+        sa.Column('sport_id', sa.Integer(), nullable=True),
+        sa.Column('season', sa.Integer(), nullable=False),
+        sa.Column('details', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.ForeignKeyConstraint(['game_mlb_id'], ['games.mlb_id'], ),
+    ]
+
+
+def at_bats_columns() -> List[sa.Column]:
+    return [
+        sa.Column('sport_id', sa.Integer(), nullable=True),
+        sa.Column('at_bat_index', sa.Integer(), nullable=False),
+        sa.Column('has_out', sa.Boolean(), nullable=False),
+        sa.Column('outs', sa.Integer(), nullable=False),
+        sa.Column('balls', sa.Integer(), nullable=False),
+        sa.Column('strikes', sa.Integer(), nullable=False),
+        sa.Column('total_pitch_count', sa.Integer(), nullable=False),
+        sa.Column('inning', sa.Integer(), nullable=False),
+        sa.Column('is_top_inning', sa.Boolean(), nullable=False),
+        sa.Column('rbi', sa.Integer(), nullable=False),
+        sa.Column('event_type', sa.String(), nullable=True),
+        sa.Column('is_scoring_play', sa.Boolean(), nullable=False),
+        sa.Column('r1b', sa.Boolean(), nullable=False),
+        sa.Column('r2b', sa.Boolean(), nullable=False),
+        sa.Column('r3b', sa.Boolean(), nullable=False),
+        sa.Column('at_bat_details_id', sa.Integer(), nullable=False),
+        sa.Column('game_id', sa.Integer(), nullable=True),
+        sa.Column('game_mlb_id', sa.Integer(), nullable=True),
+        sa.Column('pitcher_id', sa.Integer(), nullable=True),
+        sa.Column('pitcher_mlb_id', sa.Integer(), nullable=True),
+        sa.Column('batter_id', sa.Integer(), nullable=True),
+        sa.Column('batter_mlb_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['batter_id'], ['players.id'], ),
+        sa.ForeignKeyConstraint(['batter_mlb_id'], ['players.mlb_id'], ),
+        sa.ForeignKeyConstraint(['game_id'], ['games.id'], ),
+        sa.ForeignKeyConstraint(['game_mlb_id'], ['games.mlb_id'], ),
+        sa.ForeignKeyConstraint(['pitcher_id'], ['players.id'], ),
+        sa.ForeignKeyConstraint(['pitcher_mlb_id'], ['players.mlb_id'], ),
+    ]
+
+
+def pitches_columns() -> List[sa.Column]:
+    return [
+        sa.Column('pitch_index', sa.Integer(), nullable=False),
+        sa.Column('ball_count', sa.Integer(), nullable=False),
+        sa.Column('strike_count', sa.Integer(), nullable=False),
+        sa.Column('pitch_type_code', sa.String(), nullable=True),
+        sa.Column('pitch_type_description', sa.String(), nullable=True),
+        sa.Column('call_code', sa.String(), nullable=False),
+        sa.Column('call_description', sa.String(), nullable=False),
+        sa.Column('zone', sa.Integer(), nullable=True),
+        sa.Column('start_speed', sa.Float(), nullable=True),
+        sa.Column('is_ball', sa.Boolean(), nullable=False),
+        sa.Column('is_strike', sa.Boolean(), nullable=False),
+        sa.Column('is_foul', sa.Boolean(), nullable=False),
+        sa.Column('is_out', sa.Boolean(), nullable=False),
+        sa.Column('is_in_play', sa.Boolean(), nullable=False),
+        sa.Column('r1b', sa.Boolean(), nullable=True),
+        sa.Column('r2b', sa.Boolean(), nullable=True),
+        sa.Column('r3b', sa.Boolean(), nullable=True),
+        sa.Column('at_bat_id', sa.Integer(), nullable=True),
+    ]
+
+
+def set_aside(connection, table_name: str, suffix: str) -> str:
+    """
+    Rename a table and its primary key, and drop its other indexes and its
+    foreign keys, so the replacement table can take their names.
+    """
+    new_name = f'{table_name}_{suffix}'
+    # Not the clones of a partitioned table's foreign keys, which go with them
+    foreign_keys = connection.execute(sa.text(
+        "SELECT conname FROM pg_constraint WHERE conrelid = CAST(:table_name AS regclass) AND contype = 'f' AND conparentid = 0"
+    ), {'table_name': table_name}).scalars().all()
+    for foreign_key in foreign_keys:
+        op.drop_constraint(foreign_key, table_name, type_='foreignkey')
+    op.rename_table(table_name, new_name)
+    op.execute(f'ALTER TABLE {new_name} RENAME CONSTRAINT {table_name}_pkey TO {new_name}_pkey')
+    for index_name, _ in INDEXES[table_name]:
+        op.drop_index(index_name, table_name=new_name)
+    return new_name
+
+
+def create_indexes() -> None:
+    for table_name in TABLES:
+        for index_name, columns in INDEXES[table_name]:
+            op.create_index(index_name, table_name, columns, unique=False)
+
+
+def swap_sequences(old_suffix: str) -> None:
+    # Hand the id sequences over before the old tables drop them
+    for table_name in TABLES:
+        op.execute(f'ALTER SEQUENCE {table_name}_id_seq OWNED BY {table_name}.id')
+    for table_name in reversed(TABLES):
+        op.drop_table(f'{table_name}_{old_suffix}')
+    for table_name in TABLES:
+        op.execute(f'ANALYZE {table_name}')
+
+
+def get_column_names(connection, table_name: str) -> str:
+    return ', '.join(column['name'] for column in sa.inspect(connection).get_columns(table_name))
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+
+    # Referencing tables first
+    for table_name in reversed(TABLES):
+        set_aside(connection, table_name, 'unpartitioned')
+
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_table('at_bat_details',
+    id_column('at_bat_details'),
+    *at_bat_details_columns(),
+    sa.PrimaryKeyConstraint('id', 'season'),
+    postgresql_partition_by='RANGE (season)'
+    )
+    op.create_table('at_bats',
+    id_column('at_bats'),
+    sa.Column('season', sa.Integer(), autoincrement=False, nullable=False),
+    *at_bats_columns(),
+    sa.ForeignKeyConstraint(['at_bat_details_id', 'season'], ['at_bat_details.id', 'at_bat_details.season'], ),
+    sa.PrimaryKeyConstraint('id', 'season'),
+    postgresql_partition_by='RANGE (season)'
+    )
+    op.create_table('pitches',
+    id_column('pitches'),
+    sa.Column('season', sa.Integer(), autoincrement=False, nullable=False),
+    *pitches_columns(),
+    sa.ForeignKeyConstraint(['at_bat_id', 'season'], ['at_bats.id', 'at_bats.season'], ),
+    sa.PrimaryKeyConstraint('id', 'season'),
+    postgresql_partition_by='RANGE (season)'
+    )
+    # ### end Alembic commands ###
+
+    seasons = connection.execute(sa.text(
+        """
+        SELECT season FROM at_bat_details_unpartitioned
+        UNION
+        SELECT extract(year FROM game_date)::int FROM games WHERE game_date IS NOT NULL
+        ORDER BY season
+        """
+    )).scalars().all()
+    for season in seasons:
+        for table_name in TABLES:
+            op.execute(f'CREATE TABLE {table_name}_{season} PARTITION OF {table_name} FOR VALUES FROM ({season}) TO ({season + 1})')
+    print(f"\nCreated partitions for seasons {', '.join(map(str, seasons))}")
+
+    orphans = connection.execute(sa.text("SELECT count(*) FROM pitches_unpartitioned WHERE at_bat_id IS NULL")).scalar()
+    if orphans:
+        print(f"Dropping {orphans} pitches without an at bat")
+
+    # The partitions are filled one season at a time, before any index exists.
+    # An at bat's season is its play's, a pitch's season its at bat's.
+    at_bat_details_columns_list = get_column_names(connection, 'at_bat_details_unpartitioned')
+    at_bats_columns_list = get_column_names(connection, 'at_bats_unpartitioned')
+    pitches_columns_list = get_column_names(connection, 'pitches_unpartitioned')
+    for season in seasons:
+        connection.execute(sa.text(
+            f"""
+            INSERT INTO at_bat_details ({at_bat_details_columns_list})
+            SELECT {at_bat_details_columns_list} FROM at_bat_details_unpartitioned
+            WHERE season = :season
+            """
+        ), {'season': season})
+        at_bats = connection.execute(sa.text(
+            f"""
+            INSERT INTO at_bats (season, {at_bats_columns_list})
+            SELECT abd.season, {', '.join(f'ab.{column}' for column in at_bats_columns_list.split(', '))}
+            FROM at_bats_unpartitioned ab
+            JOIN at_bat_details_unpartitioned abd ON abd.id = ab.at_bat_details_id
+            WHERE abd.season = :season
+            """
+        ), {'season': season})
+        pitches = connection.execute(sa.text(
+            f"""
+            INSERT INTO pitches (season, {pitches_columns_list})
+            SELECT ab.season, {', '.join(f'p.{column}' for column in pitches_columns_list.split(', '))}
+            FROM pitches_unpartitioned p
+            JOIN at_bats ab ON ab.id = p.at_bat_id
+            WHERE ab.season = :season
+            """
+        ), {'season': season})
+        print(f"Copied {at_bats.rowcount} at bats and {pitches.rowcount} pitches for season {season}")
+
+    create_indexes()
+    swap_sequences('unpartitioned')
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+
+    for table_name in reversed(TABLES):
+        set_aside(connection, table_name, 'partitioned')
+
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_table('at_bat_details',
+    id_column('at_bat_details'),
+    *at_bat_details_columns(),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('at_bats',
+    id_column('at_bats'),
+    *at_bats_columns(),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('pitches',
+    id_column('pitches'),
+    *pitches_columns(),
+    sa.PrimaryKeyConstraint('id')
+    )
+    # ### end Alembic commands ###
+
+    print("\nCopying rows out of the partitions...")
+    for table_name in TABLES:
+        columns = get_column_names(connection, table_name)
+        result = connection.execute(sa.text(f'INSERT INTO {table_name} ({columns}) SELECT {columns} FROM {table_name}_partitioned ORDER BY id'))
+        print(f"Copied {result.rowcount} rows to {table_name}")
+
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_foreign_key('at_bats_at_bat_details_id_fkey', 'at_bats', 'at_bat_details', ['at_bat_details_id'], ['id'])
+    op.create_foreign_key('pitches_at_bat_id_fkey', 'pitches', 'at_bats', ['at_bat_id'], ['id'])
+    # ### end Alembic commands ###
+    create_indexes()
+
+    # Partitions still attached go with their parent table
+    swap_sequences('partitioned')
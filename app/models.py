@@ -7,12 +7,15 @@ from sqlalchemy import (
     DateTime,
     Float,
     ForeignKey,
+    ForeignKeyConstraint,
     Index,
     Integer,
     String,
+    func,
+    select,
 )
 
-from sqlalchemy.orm import declarative_mixin, Mapped, relationship
+from sqlalchemy.orm import column_property, declarative_mixin, Mapped, relationship
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.dialects.postgresql import JSONB
 
@@ -22,11 +25,10 @@ Base = declarative_base()
 
 @declarative_mixin
 class TimestampMixin:
-    created_at: Mapped[datetime] = Column(
-        DateTime, default=datetime.now(), nullable=False
-    )
+    # Evaluated by the database on every insert and update
+    created_at: Mapped[datetime] = Column(DateTime, default=func.now(), nullable=False)
     updated_at: Mapped[datetime] = Column(
-        DateTime, default=datetime.now(), onupdate=datetime.now(), nullable=False
+        DateTime, default=func.now(), onupdate=func.now(), nullable=False
     )
 
 
@@ -135,19 +137,35 @@ class Game(Base, TimestampMixin):
 class AtBatDetails(Base):
     __tablename__ = "at_bat_details"
 
-    id: Mapped[int] = Column(Integer, primary_key=True)
+    """
+    at_bat_details, at_bats and pitches are partitioned by season, one
+    partition per season and table (e.g. at_bat_details_2024), so season is
+    part of their primary keys and of the foreign keys between them.
+    """
+
+    id: Mapped[int] = Column(Integer, primary_key=True, autoincrement=True)
     game_mlb_id: Mapped[int] = Column(Integer, ForeignKey("games.mlb_id"))
     sport_id: Mapped[int] = Column(Integer, nullable=True)
-    season: Mapped[int] = Column(Integer, nullable=False)
+    season: Mapped[int] = Column(Integer, primary_key=True, autoincrement=False)
     details: Mapped[dict] = Column(JSONB)
 
-    __table_args__ = (Index("idx_abdetails_game_mlb_id", "game_mlb_id"),)
+    __table_args__ = (
+        Index("idx_abdetails_game_mlb_id", "game_mlb_id"),
+        {"postgresql_partition_by": "RANGE (season)"},
+    )
 
 
 class AtBat(Base):
     __tablename__ = "at_bats"
 
-    id: Mapped[int] = Column(Integer, primary_key=True)
+    """
+    The raw play JSON is only stored once, in at_bat_details. details and
+    result are read from there through at_bat_details_id, and are loaded on
+    first access.
+    """
+
+    id: Mapped[int] = Column(Integer, primary_key=True, autoincrement=True)
+    season: Mapped[int] = Column(Integer, primary_key=True, autoincrement=False)
     sport_id: Mapped[int] = Column(Integer, nullable=True)
     at_bat_index: Mapped[int] = Column(Integer, nullable=False)
     has_out: Mapped[bool] = Column(Boolean, nullable=False)
@@ -157,16 +175,30 @@ class AtBat(Base):
     total_pitch_count: Mapped[int] = Column(Integer, nullable=False)
     inning: Mapped[int] = Column(Integer, nullable=False)
     is_top_inning: Mapped[bool] = Column(Boolean, nullable=False)
-    result: Mapped[dict] = Column(JSONB)
     rbi: Mapped[int] = Column(Integer, nullable=False)
     event_type: Mapped[str] = Column(String, nullable=True)
     is_scoring_play: Mapped[bool] = Column(Boolean, nullable=False)
     r1b: Mapped[bool] = Column(Boolean, nullable=False)
     r2b: Mapped[bool] = Column(Boolean, nullable=False)
     r3b: Mapped[bool] = Column(Boolean, nullable=False)
-    details: Mapped[dict] = Column(JSONB)
 
     # Relationships
+    at_bat_details_id: Mapped[int] = Column(Integer, nullable=False)
+    at_bat_details: Mapped["AtBatDetails"] = relationship(
+        "AtBatDetails", foreign_keys=[at_bat_details_id, season]
+    )
+    details: Mapped[dict] = column_property(
+        select(AtBatDetails.details)
+        .where(AtBatDetails.id == at_bat_details_id, AtBatDetails.season == season)
+        .scalar_subquery(),
+        deferred=True,
+    )
+    result: Mapped[dict] = column_property(
+        select(AtBatDetails.details["result"])
+        .where(AtBatDetails.id == at_bat_details_id, AtBatDetails.season == season)
+        .scalar_subquery(),
+        deferred=True,
+    )
     game_id: Mapped[int] = Column(Integer, ForeignKey("games.id"))
     game: Mapped["Game"] = relationship("Game", foreign_keys=[game_id])
     game_mlb_id: Mapped[int] = Column(Integer, ForeignKey("games.mlb_id"))
@@ -182,7 +214,7 @@ class AtBat(Base):
     batter_mlb_id: Mapped[int] = Column(Integer, ForeignKey("players.mlb_id"))
     mlb_batter: Mapped["Player"] = relationship("Player", foreign_keys=[batter_mlb_id])
     pitches: Mapped[List["Pitch"]] = relationship(
-        "Pitch", back_populates="at_bat", foreign_keys="Pitch.at_bat_id"
+        "Pitch", back_populates="at_bat", foreign_keys="[Pitch.at_bat_id, Pitch.season]"
     )
 
     __table_args__ = (
@@ -193,6 +225,12 @@ class AtBat(Base):
         Index("idx_at_bat_batter_mlb_id", "batter_mlb_id"),
         Index("idx_at_bat_game_id", "game_id"),
         Index("idx_at_bat_game_mlb_id", "game_mlb_id"),
+        Index("idx_at_bat_at_bat_details_id", "at_bat_details_id"),
+        ForeignKeyConstraint(
+            ["at_bat_details_id", "season"],
+            ["at_bat_details.id", "at_bat_details.season"],
+        ),
+        {"postgresql_partition_by": "RANGE (season)"},
     )
 
 
@@ -246,7 +284,8 @@ class Pitch(Base):
     - (Z,"In play, run(s)")
     """
 
-    id: Mapped[int] = Column(Integer, primary_key=True)
+    id: Mapped[int] = Column(Integer, primary_key=True, autoincrement=True)
+    season: Mapped[int] = Column(Integer, primary_key=True, autoincrement=False)
     pitch_index: Mapped[int] = Column(Integer, nullable=False)
     ball_count: Mapped[int] = Column(Integer, nullable=False)
     strike_count: Mapped[int] = Column(Integer, nullable=False)
@@ -264,10 +303,120 @@ class Pitch(Base):
     r1b: Mapped[bool] = Column(Boolean, nullable=True)
     r2b: Mapped[bool] = Column(Boolean, nullable=True)
     r3b: Mapped[bool] = Column(Boolean, nullable=True)
-    details: Mapped[dict] = Column(JSONB)
+
+    # Measurements from the event's "pitchData" (see PITCH_DATA_FIELDS), so
+    # analytics never parse the play JSON. px is the horizontal location in
+    # feet from the middle of the plate (negative on the catcher's left), pz
+    # the height in feet. The strike zone is the one set for this pitch.
+    end_speed: Mapped[float] = Column(Float, nullable=True)
+    extension: Mapped[float] = Column(Float, nullable=True)
+    plate_time: Mapped[float] = Column(Float, nullable=True)
+    type_confidence: Mapped[float] = Column(Float, nullable=True)
+    strike_zone_top: Mapped[float] = Column(Float, nullable=True)
+    strike_zone_bottom: Mapped[float] = Column(Float, nullable=True)
+    px: Mapped[float] = Column(Float, nullable=True)
+    pz: Mapped[float] = Column(Float, nullable=True)
+    pfx_x: Mapped[float] = Column(Float, nullable=True)
+    pfx_z: Mapped[float] = Column(Float, nullable=True)
+    x0: Mapped[float] = Column(Float, nullable=True)
+    y0: Mapped[float] = Column(Float, nullable=True)
+    z0: Mapped[float] = Column(Float, nullable=True)
+    vx0: Mapped[float] = Column(Float, nullable=True)
+    vy0: Mapped[float] = Column(Float, nullable=True)
+    vz0: Mapped[float] = Column(Float, nullable=True)
+    ax: Mapped[float] = Column(Float, nullable=True)
+    ay: Mapped[float] = Column(Float, nullable=True)
+    az: Mapped[float] = Column(Float, nullable=True)
+    spin_rate: Mapped[float] = Column(Float, nullable=True)
+    spin_direction: Mapped[float] = Column(Float, nullable=True)
+    break_angle: Mapped[float] = Column(Float, nullable=True)
+    break_length: Mapped[float] = Column(Float, nullable=True)
+    break_y: Mapped[float] = Column(Float, nullable=True)
+    break_vertical: Mapped[float] = Column(Float, nullable=True)
+    break_vertical_induced: Mapped[float] = Column(Float, nullable=True)
+    break_horizontal: Mapped[float] = Column(Float, nullable=True)
 
     # Relationships
-    at_bat_id: Mapped[int] = Column(Integer, ForeignKey("at_bats.id"))
-    at_bat: Mapped["AtBat"] = relationship("AtBat", foreign_keys=[at_bat_id])
+    at_bat_id: Mapped[int] = Column(Integer)
+    at_bat: Mapped["AtBat"] = relationship(
+        "AtBat", back_populates="pitches", foreign_keys=[at_bat_id, season]
+    )
+    # The pitch's event in its play, which pitch_index points into
+    details: Mapped[dict] = column_property(
+        select(AtBatDetails.details["playEvents"][pitch_index])
+        .join(
+            AtBat,
+            (AtBat.at_bat_details_id == AtBatDetails.id)
+            & (AtBat.season == AtBatDetails.season),
+        )
+        .where(AtBat.id == at_bat_id, AtBat.season == season)
+        .scalar_subquery(),
+        deferred=True,
+    )
+
+    __table_args__ = (
+        Index("idx_pitch_at_bat_id", "at_bat_id"),
+        ForeignKeyConstraint(["at_bat_id", "season"], ["at_bats.id", "at_bats.season"]),
+        {"postgresql_partition_by": "RANGE (season)"},
+    )
+
+
+class IngestionState(Base):
+    __tablename__ = "ingestion_state"
+
+    """
+    One row per game and loader stage once the stage has written that game's
+    rows. Stages: at_bat_details, at_bats, pitches
+    """
+
+    id: Mapped[int] = Column(Integer, primary_key=True)
+    stage: Mapped[str] = Column(String, nullable=False)
+    sport_id: Mapped[int] = Column(Integer, nullable=False)
+    season: Mapped[int] = Column(Integer, nullable=False)
+    game_mlb_id: Mapped[int] = Column(
+        Integer, ForeignKey("games.mlb_id"), nullable=False
+    )
+    completed_at: Mapped[datetime] = Column(
+        DateTime, default=datetime.now, nullable=False
+    )
+
+    __table_args__ = (
+        Index(
+            "idx_ingestion_state_key",
+            "stage",
+            "sport_id",
+            "season",
+            "game_mlb_id",
+            unique=True,
+        ),
+    )
+
+
+class GameFetch(Base):
+    __tablename__ = "game_fetches"
 
-    __table_args__ = (Index("idx_pitch_at_bat_id", "at_bat_id"),)
+    """
+    Ledger of "game_playByPlay" fetches, one row per game, updated on every
+    attempt. Statuses:
+    - fetched: the game's plays were fetched
+    - empty: the game has no plays yet (e.g. postponed or not played yet)
+    - failed: the last fetch raised, retried after next_attempt_at
+    - poison: failed too many times, only fetched again once reset
+    """
+
+    id: Mapped[int] = Column(Integer, primary_key=True)
+    game_mlb_id: Mapped[int] = Column(
+        Integer, ForeignKey("games.mlb_id"), nullable=False, unique=True
+    )
+    sport_id: Mapped[int] = Column(Integer, nullable=False)
+    season: Mapped[int] = Column(Integer, nullable=True)
+    status: Mapped[str] = Column(String, nullable=False)
+    attempts: Mapped[int] = Column(Integer, nullable=False, default=0)
+    last_error: Mapped[str] = Column(String, nullable=True)
+    payload_bytes: Mapped[int] = Column(Integer, nullable=True)
+    latency: Mapped[float] = Column(Float, nullable=True)
+    at_bat_count: Mapped[int] = Column(Integer, nullable=True)
+    last_attempt_at: Mapped[datetime] = Column(DateTime, nullable=False)
+    next_attempt_at: Mapped[datetime] = Column(DateTime, nullable=True)
+
+    __table_args__ = (Index("idx_game_fetches_status", "sport_id", "status"),)
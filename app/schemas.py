@@ -65,16 +65,15 @@ class AtBatSchema(BaseModel):
     total_pitch_count: int
     inning: int
     is_top_inning: bool
-    result: dict
     rbi: int
     event_type: Optional[str]
     is_scoring_play: bool
     r1b: bool
     r2b: bool
     r3b: bool
-    details: dict
 
     # Relationships
+    at_bat_details_id: int
     game_id: int
     game_mlb_id: int
     pitcher_id: int
@@ -104,7 +103,33 @@ class PitchSchema(BaseModel):
     r1b: Optional[bool]
     r2b: Optional[bool]
     r3b: Optional[bool]
-    details: dict
+    end_speed: Optional[float]
+    extension: Optional[float]
+    plate_time: Optional[float]
+    type_confidence: Optional[float]
+    strike_zone_top: Optional[float]
+    strike_zone_bottom: Optional[float]
+    px: Optional[float]
+    pz: Optional[float]
+    pfx_x: Optional[float]
+    pfx_z: Optional[float]
+    x0: Optional[float]
+    y0: Optional[float]
+    z0: Optional[float]
+    vx0: Optional[float]
+    vy0: Optional[float]
+    vz0: Optional[float]
+    ax: Optional[float]
+    ay: Optional[float]
+    az: Optional[float]
+    spin_rate: Optional[float]
+    spin_direction: Optional[float]
+    break_angle: Optional[float]
+    break_length: Optional[float]
+    break_y: Optional[float]
+    break_vertical: Optional[float]
+    break_vertical_induced: Optional[float]
+    break_horizontal: Optional[float]
 
     # Relationship
     at_bat_id: int
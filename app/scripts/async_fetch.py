@@ -0,0 +1,253 @@
+import asyncio
+import concurrent.futures
+import contextlib
+import queue
+import threading
+import time
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Set, Tuple
+
+import requests
+import statsapi
+from requests.adapters import HTTPAdapter
+
+from app.scripts.statsapi_cache import response_cache
+from app.scripts.utils import get_at_bat_plays
+
+
+class AdaptiveLimiter:
+    """
+    AIMD (additive increase, multiplicative decrease) concurrency limit.
+
+    Every fast, successful request grows the limit by roughly one slot per
+    round trip. A failure or a request slower than target_latency halves it,
+    at most once per cooldown period so a burst of failures from the same
+    window only counts once.
+    """
+
+    def __init__(
+        self,
+        initial: int = 10,
+        minimum: int = 1,
+        maximum: int = 64,
+        target_latency: float = 2.0,
+        cooldown: float = 1.0,
+    ):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.cooldown = cooldown
+        self.last_decrease = 0.0
+
+    @property
+    def current(self) -> int:
+        return int(self.limit)
+
+    def on_success(self, latency: float) -> None:
+        if latency > self.target_latency:
+            self.decrease()
+            return
+        self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+    def on_failure(self) -> None:
+        self.decrease()
+
+    def decrease(self) -> None:
+        now = time.monotonic()
+        if now - self.last_decrease < self.cooldown:
+            return
+        self.last_decrease = now
+        self.limit = max(self.minimum, self.limit / 2)
+
+
+class PlayByPlayClient:
+    """
+    Pooled keep-alive client for the "game_playByPlay" endpoint.
+
+    Requests go through one requests.Session, so connections are reused
+    across games. The blocking calls run on a dedicated executor that is
+    sized to the limiter's maximum and driven from the event loop.
+    """
+
+    def __init__(self, max_connections: int, max_attempts: int = 3):
+        self.max_attempts = max_attempts
+        self.http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections)
+        self.http.mount("https://", adapter)
+        self.http.mount("http://", adapter)
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_connections
+        )
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True)
+        self.http.close()
+
+    def request_game_plays(self, game_id: int) -> Dict:
+        # Resolve the url from statsapi so any endpoint override also applies here
+        url = statsapi.ENDPOINTS["game_playByPlay"]["url"].format(
+            ver="v1", gamePk=game_id
+        )
+        response = self.http.get(url, timeout=30)
+        response.raise_for_status()
+        return response.json()
+
+    def get_game_plays(self, game_id: int, final: bool = False) -> Dict:
+        # Only the play-by-play of a final game is cached for good
+        return response_cache.get_or_fetch(
+            "game_playByPlay",
+            {"gamePk": game_id},
+            lambda: self.request_game_plays(game_id),
+            permanent=final,
+        )
+
+    async def fetch_at_bats(
+        self, game_id: int, limiter: AdaptiveLimiter, final: bool = False
+    ) -> Tuple[int, List[Dict], Dict]:
+        loop = asyncio.get_running_loop()
+        for attempt in range(1, self.max_attempts + 1):
+            start = time.monotonic()
+            try:
+                game_plays_data = await loop.run_in_executor(
+                    self.executor, self.get_game_plays, game_id, final
+                )
+                latency = time.monotonic() - start
+                limiter.on_success(latency)
+                return (
+                    game_id,
+                    get_at_bat_plays(game_plays_data or {}),
+                    {"latency": latency, "error": None},
+                )
+            except Exception as e:
+                limiter.on_failure()
+                if attempt == self.max_attempts:
+                    print(f"Failure for game {game_id}, error: {e}")
+                    return (
+                        game_id,
+                        [],
+                        {"latency": time.monotonic() - start, "error": str(e)},
+                    )
+                # Back off before retrying so a throttled API gets some air
+                await asyncio.sleep(2**attempt)
+
+
+async def stream_at_bats_for_games(
+    game_ids: Iterable[int],
+    final_game_ids: Set[int] = frozenset(),
+    initial_concurrency: int = 10,
+    max_concurrency: int = 64,
+    target_latency: float = 2.0,
+) -> AsyncIterator[Tuple[int, List[Dict], Dict]]:
+    """
+    Fetch at-bats for every game, yielding (game_mlb_id, at_bats, fetch) as
+    each game completes, where fetch is {"latency", "error"} of its last
+    attempt. The number of in-flight requests follows an AdaptiveLimiter.
+    The responses of games in final_game_ids are cached for good.
+    """
+    limiter = AdaptiveLimiter(
+        initial=initial_concurrency,
+        maximum=max_concurrency,
+        target_latency=target_latency,
+    )
+    client = PlayByPlayClient(max_connections=max_concurrency)
+    remaining = iter(game_ids)
+    in_flight = set()
+    exhausted = False
+
+    try:
+        while True:
+            while not exhausted and len(in_flight) < limiter.current:
+                game_id = next(remaining, None)
+                if game_id is None:
+                    exhausted = True
+                    break
+                in_flight.add(
+                    asyncio.create_task(
+                        client.fetch_at_bats(
+                            game_id, limiter, game_id in final_game_ids
+                        )
+                    )
+                )
+
+            if not in_flight:
+                break
+
+            done, in_flight = await asyncio.wait(
+                in_flight, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                yield task.result()
+    finally:
+        for task in in_flight:
+            task.cancel()
+        client.close()
+
+
+def iter_at_bats_for_games(
+    game_ids: Iterable[int], max_pending: int = 100, **kwargs
+) -> Iterator[Tuple[int, List[Dict], Dict]]:
+    """
+    Synchronous view over stream_at_bats_for_games for the loaders.
+
+    The event loop runs on a background thread and hands results over through
+    a bounded queue, so fetching pauses when the consumer falls more than
+    max_pending games behind. An error in the producer is handed over too and
+    raised here. If the consumer stops early (an error while loading, or the
+    generator being closed), the producer is told to stop, cancels the
+    in-flight fetches and exits instead of blocking on the full queue.
+    """
+    results = queue.Queue(maxsize=max_pending)
+    stop = threading.Event()
+    done = object()
+
+    def put(item) -> bool:
+        # Wait for room in the queue, unless the consumer is gone
+        while not stop.is_set():
+            try:
+                results.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run() -> None:
+        async def produce() -> None:
+            loop = asyncio.get_running_loop()
+            async with contextlib.aclosing(
+                stream_at_bats_for_games(game_ids, **kwargs)
+            ) as stream:
+                async for result in stream:
+                    if not await loop.run_in_executor(None, put, result):
+                        return
+
+        try:
+            asyncio.run(produce())
+        except BaseException as e:
+            put(e)
+        finally:
+            put(done)
+
+    producer = threading.Thread(target=run, daemon=True)
+    producer.start()
+
+    try:
+        while (result := results.get()) is not done:
+            if isinstance(result, BaseException):
+                raise result
+            yield result
+    finally:
+        stop.set()
+        producer.join()
+
+
+def get_at_bats_data_for_games(
+    game_ids: Iterable[int], **kwargs
+) -> Dict[int, List[Dict]]:
+    """
+    Fetch at-bats for many games at once.
+    Same contract as get_at_bats_data_for_game, keyed by game_mlb_id.
+    """
+    return {
+        game_id: at_bats
+        for game_id, at_bats, _ in iter_at_bats_for_games(game_ids, **kwargs)
+    }
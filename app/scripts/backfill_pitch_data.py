@@ -0,0 +1,110 @@
+import argparse
+from datetime import datetime
+from typing import List
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.scripts import db_engine
+from app.scripts.constants import PITCH_DATA_FIELDS
+from app.scripts.partitions import get_attached_seasons
+from app.scripts.pitch_snapshot import invalidate_pitch_snapshot
+
+
+PITCH_DATA_ASSIGNMENTS = ",\n        ".join(
+    f"{column} = (pitch_data #>> '{{{','.join(path)}}}')::float"
+    for column, path in PITCH_DATA_FIELDS.items()
+)
+
+# Copy the "pitchData" fields of every pitch in an id range of one season from
+# its play in at_bat_details, the same values load_pitches writes
+BACKFILL_PITCH_DATA_SQL = text(
+    f"""
+    UPDATE pitches p
+    SET
+        {PITCH_DATA_ASSIGNMENTS}
+    FROM (
+        SELECT
+            p.id,
+            abd.details->'playEvents'->p.pitch_index->'pitchData' AS pitch_data
+        FROM pitches p
+        JOIN at_bats ab ON ab.id = p.at_bat_id AND ab.season = p.season
+        JOIN at_bat_details abd
+            ON abd.id = ab.at_bat_details_id AND abd.season = ab.season
+        WHERE p.season = :season
+        AND p.id >= :start_id AND p.id < :end_id
+    ) events
+    WHERE p.season = :season
+    AND p.id = events.id
+    """
+)
+
+
+def backfill_pitch_data(seasons: List[int] = None, batch_size: int = 50000) -> None:
+    """
+    Fill the pitchData columns of existing pitches from their plays in
+    at_bat_details. Each season's partition is walked in id ranges of
+    batch_size pitches, each updated and committed in its own transaction, so
+    locks stay short and an interrupted run can simply be started again. The
+    pitch snapshot is invalidated before the first update.
+
+    Args:
+        seasons (List[int], optional): The seasons to fill. Defaults to all of them.
+        batch_size (int): Range of pitch ids updated per transaction
+    """
+    with Session(db_engine) as session:
+        if seasons is None:
+            seasons = get_attached_seasons(session)["pitches"]
+
+        for season in seasons:
+            start_time = datetime.now()
+            min_id, max_id = session.execute(
+                text("SELECT min(id), max(id) FROM pitches WHERE season = :season"),
+                {"season": season},
+            ).one()
+            session.commit()
+            if min_id is None:
+                print(f"No pitches for season {season}")
+                continue
+
+            updated = 0
+            invalidate_pitch_snapshot()
+            for start_id in range(min_id, max_id + 1, batch_size):
+                result = session.execute(
+                    BACKFILL_PITCH_DATA_SQL,
+                    {
+                        "season": season,
+                        "start_id": start_id,
+                        "end_id": start_id + batch_size,
+                    },
+                )
+                session.commit()
+                updated += result.rowcount
+                print(
+                    f"Filled {updated} pitches for season {season} (up to id {min(start_id + batch_size - 1, max_id)} of {max_id})"
+                )
+
+            print(
+                f"Filled {updated} pitches for season {season} in {(datetime.now() - start_time).total_seconds() / 60:.2f} minutes"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Fill the pitchData columns of existing pitches"
+    )
+    parser.add_argument(
+        "--season",
+        type=int,
+        action="append",
+        help="Season to fill. Can be repeated; defaults to all of them.",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=50000,
+        help="Range of pitch ids updated per transaction",
+    )
+    args = parser.parse_args()
+
+    backfill_pitch_data(args.season, args.batch_size)
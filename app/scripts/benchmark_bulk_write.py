@@ -0,0 +1,111 @@
+import argparse
+import copy
+from datetime import datetime
+
+from sqlalchemy.orm import Session
+
+from app.models import AtBatDetails, Pitch
+from app.scripts import db_engine
+from app.scripts.bulk_write import copy_rows, get_insert_columns, object_rows
+
+
+SAMPLE_PITCH_EVENT = {
+    "type": "pitch",
+    "index": 0,
+    "isPitch": True,
+    "count": {"balls": 0, "strikes": 1, "outs": 0},
+    "details": {
+        "call": {"code": "C", "description": "Called Strike"},
+        "type": {"code": "FF", "description": "Four-Seam Fastball"},
+        "isBall": False,
+        "isStrike": True,
+        "isOut": False,
+        "isInPlay": False,
+    },
+    "pitchData": {
+        "startSpeed": 95.1,
+        "endSpeed": 86.4,
+        "strikeZoneTop": 3.41,
+        "strikeZoneBottom": 1.61,
+        "zone": 5,
+        "coordinates": {"pX": 0.12, "pZ": 2.53, "x": 112.4, "y": 175.3},
+        "breaks": {"spinRate": 2310, "spinDirection": 211},
+    },
+}
+
+SAMPLE_PLAY = {
+    "result": {"type": "atBat", "eventType": "strikeout", "rbi": 0},
+    "about": {"atBatIndex": 0, "inning": 1, "isTopInning": True, "hasOut": True},
+    "matchup": {"batter": {"id": 1}, "pitcher": {"id": 2}},
+    "runners": [],
+    "playEvents": [SAMPLE_PITCH_EVENT] * 4,
+}
+
+
+def build_objects(table_name: str, rows: int) -> list:
+    if table_name == "at_bat_details":
+        return [
+            AtBatDetails(sport_id=1, season=2024, details=copy.deepcopy(SAMPLE_PLAY))
+            for _ in range(rows)
+        ]
+
+    return [
+        Pitch(
+            pitch_index=i % 6,
+            ball_count=0,
+            strike_count=0,
+            pitch_type_code="FF",
+            pitch_type_description="Four-Seam Fastball",
+            call_code="C",
+            call_description="Called Strike",
+            zone=5,
+            start_speed=95.1,
+            is_ball=False,
+            is_strike=True,
+            is_foul=False,
+            is_out=False,
+            is_in_play=False,
+        )
+        for i in range(rows)
+    ]
+
+
+def time_write(method: str, table_name: str, rows: int) -> float:
+    """
+    Write synthetic rows with the given method and return rows/sec.
+    The transaction is rolled back so the benchmark leaves no data behind.
+    """
+    model = AtBatDetails if table_name == "at_bat_details" else Pitch
+    columns = get_insert_columns(model.__table__)
+    objects = build_objects(table_name, rows)
+
+    with Session(db_engine) as session:
+        start_time = datetime.now()
+        if method == "bulk_save_objects":
+            session.bulk_save_objects(objects)
+            session.flush()
+        else:
+            copy_rows(session, model.__table__, columns, object_rows(objects, columns))
+        elapsed = (datetime.now() - start_time).total_seconds()
+        session.rollback()
+
+    return rows / elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare bulk_save_objects against COPY for the heavy tables"
+    )
+    parser.add_argument(
+        "--table",
+        type=str,
+        choices=["at_bat_details", "pitches"],
+        default="at_bat_details",
+        help="Table to write synthetic rows to",
+    )
+    parser.add_argument("--rows", type=int, default=50000, help="Rows per run")
+    args = parser.parse_args()
+
+    for method in ["bulk_save_objects", "copy"]:
+        rows_per_sec = time_write(method, args.table, args.rows)
+        print(f"{method}: {rows_per_sec:,.0f} rows/sec into {args.table}")
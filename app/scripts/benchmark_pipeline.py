@@ -0,0 +1,121 @@
+import argparse
+from datetime import date, datetime
+
+from app.scripts.ingest_games import ingest_games
+from app.scripts.load_at_bat_details import load_at_bat_details
+from app.scripts.load_at_bats import load_at_bats
+from app.scripts.load_games import load_games
+from app.scripts.load_pitches import load_pitches
+from app.scripts.load_players import load_players
+from app.scripts.load_teams import load_teams
+from app.scripts.statsapi_cache import response_cache
+from app.scripts.statsapi_replay import FixtureStore, start_replay_server
+
+
+def run_pipeline(
+    sport_id: int, season: int, async_fetch: bool = False, fused: bool = False
+) -> dict:
+    """
+    Run every loader for one league and season, in dependency order, and
+    return the elapsed seconds per stage. With fused, at-bat details, at-bats
+    and pitches are loaded together by ingest_games.
+    """
+    stages = [
+        ("teams", lambda: load_teams(sport_id, season, season + 1)),
+        ("players", lambda: load_players(sport_id, season, season + 1)),
+        (
+            "games",
+            lambda: load_games(sport_id, date(season, 1, 1), date(season, 12, 31)),
+        ),
+    ]
+    if fused:
+        stages.append(
+            ("ingest_games", lambda: ingest_games(sport_id, season, async_fetch))
+        )
+    else:
+        stages += [
+            (
+                "at_bat_details",
+                lambda: load_at_bat_details(sport_id, season, async_fetch=async_fetch),
+            ),
+            ("at_bats", lambda: load_at_bats(sport_id, season)),
+            ("pitches", lambda: load_pitches(sport_id, season)),
+        ]
+
+    timings = {}
+    for stage, run_stage in stages:
+        start_time = datetime.now()
+        run_stage()
+        timings[stage] = (datetime.now() - start_time).total_seconds()
+
+    return timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Time the full loader pipeline against recorded StatsAPI fixtures"
+    )
+    parser.add_argument("--sport-id", type=int, required=True, help="ID of the league")
+    parser.add_argument("--season", type=int, required=True, help="Season to load")
+    parser.add_argument(
+        "--fixtures", type=str, required=True, help="Fixtures directory"
+    )
+    parser.add_argument("--port", type=int, default=8765, help="Replay server port")
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Injected latency in seconds"
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=0.0, help="Latency jitter in seconds"
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of requests answered with a 503",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="Seed for injected latency and errors"
+    )
+    parser.add_argument(
+        "--record",
+        action="store_true",
+        help="Fetch and save missing fixtures from the real StatsAPI",
+    )
+    parser.add_argument(
+        "--async-fetch",
+        action="store_true",
+        help="Use the asyncio fetcher for play-by-play data",
+    )
+    parser.add_argument(
+        "--fused",
+        action="store_true",
+        help="Load at-bat details, at-bats and pitches in a single pass",
+    )
+    parser.add_argument(
+        "--use-cache",
+        action="store_true",
+        help="Keep the on-disk response cache enabled (off by default so every "
+        "request reaches the replay server)",
+    )
+    args = parser.parse_args()
+
+    response_cache.enabled = args.use_cache
+    server = start_replay_server(
+        FixtureStore(args.fixtures),
+        port=args.port,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        record=args.record,
+        seed=args.seed,
+    )
+    print(f"Replaying StatsAPI fixtures from {args.fixtures} at {server.base_url}")
+
+    timings = run_pipeline(args.sport_id, args.season, args.async_fetch, args.fused)
+    server.shutdown()
+
+    print("\nStage timings:")
+    for stage, seconds in timings.items():
+        print(f"- {stage}: {seconds:.2f}s")
+    print(f"- total: {sum(timings.values()):.2f}s")
+    print(f"Replay server stats: {server.stats}")
@@ -0,0 +1,88 @@
+import argparse
+import copy
+import json
+from datetime import datetime
+
+from app.scripts.benchmark_bulk_write import SAMPLE_PITCH_EVENT, SAMPLE_PLAY
+from app.scripts.load_at_bats import build_game_at_bats
+from app.scripts.load_pitches import build_game_pitches
+from app.scripts.parallel import map_in_processes
+
+
+def build_corpus(games: int, at_bats_per_game: int) -> list:
+    """
+    Synthetic games in the shape load_at_bats streams them:
+    (game_mlb_id, game_id, [(at_bat_details_id, season, details JSON), ...]).
+    """
+    corpus = []
+    at_bat_details_id = 0
+    for game_id in range(1, games + 1):
+        game_at_bat_details = []
+        for at_bat_index in range(at_bats_per_game):
+            at_bat_details_id += 1
+            details = copy.deepcopy(SAMPLE_PLAY)
+            details["about"]["atBatIndex"] = at_bat_index
+            details["about"]["isScoringPlay"] = False
+            details["runners"] = [{"movement": {"start": "1B", "end": "2B"}}]
+            details["playEvents"] = [
+                dict(
+                    copy.deepcopy(SAMPLE_PITCH_EVENT),
+                    index=i,
+                    count={"balls": i // 2, "strikes": min(i, 2), "outs": 0},
+                )
+                for i in range(6)
+            ]
+            game_at_bat_details.append((at_bat_details_id, 2024, json.dumps(details)))
+        corpus.append((game_id, game_id, game_at_bat_details))
+    return corpus
+
+
+def time_transform(name: str, transform, items: list, workers: int, **kwargs):
+    """
+    Run a transform over the corpus, print its throughput and return the results.
+    """
+    start_time = datetime.now()
+    results = list(map_in_processes(transform, items, workers, **kwargs))
+    elapsed = (datetime.now() - start_time).total_seconds()
+    rows = sum(row_count for _, row_count, _ in results)
+    print(f"{name} with {workers} worker(s): {rows / elapsed:,.0f} rows/sec")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare the serial and process pool row transforms"
+    )
+    parser.add_argument("--games", type=int, default=2000, help="Games in the corpus")
+    parser.add_argument(
+        "--at-bats-per-game", type=int, default=75, help="At-bats per game"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=4, help="Workers for the parallel run"
+    )
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.games, args.at_bats_per_game)
+    player_id_mappings = {1: 1, 2: 2}
+    pitch_corpus = [
+        [
+            (at_bat_details_id, season, json.dumps(json.loads(details)["playEvents"]))
+            for at_bat_details_id, season, details in game_at_bat_details
+        ]
+        for _, _, game_at_bat_details in corpus
+    ]
+
+    for workers in [1, args.workers]:
+        at_bats = time_transform(
+            "at_bats",
+            build_game_at_bats,
+            corpus,
+            workers,
+            sport_id=1,
+            player_id_mappings=player_id_mappings,
+        )
+        pitches = time_transform("pitches", build_game_pitches, pitch_corpus, workers)
+        if workers == 1:
+            serial_results = (at_bats, pitches)
+        elif (at_bats, pitches) != serial_results:
+            raise RuntimeError("Parallel rows differ from the serial rows")
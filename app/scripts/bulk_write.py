@@ -0,0 +1,285 @@
+import json
+import struct
+from datetime import date, datetime
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from sqlalchemy import (
+    Boolean,
+    Date,
+    DateTime,
+    Float,
+    Integer,
+    String,
+    Table,
+    func,
+    literal_column,
+)
+from sqlalchemy.dialects.postgresql import JSONB, insert
+from sqlalchemy.orm import Session
+
+
+# https://www.postgresql.org/docs/current/sql-copy.html#id-1.9.3.55.9.4
+COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+COPY_TRAILER = struct.pack("!h", -1)
+NULL_FIELD = struct.pack("!i", -1)
+JSONB_VERSION = b"\x01"
+
+PG_EPOCH_DATE = date(2000, 1, 1)
+PG_EPOCH_DATETIME = datetime(2000, 1, 1)
+
+
+def encode_int(value: Any) -> bytes:
+    return struct.pack("!ii", 4, value)
+
+
+def encode_float(value: Any) -> bytes:
+    return struct.pack("!id", 8, value)
+
+
+def encode_bool(value: Any) -> bytes:
+    return struct.pack("!i?", 1, value)
+
+
+def encode_text(value: Any) -> bytes:
+    data = str(value).encode("utf-8")
+    return struct.pack("!i", len(data)) + data
+
+
+def encode_jsonb(value: Any) -> bytes:
+    # Already serialized payloads are passed through untouched
+    if isinstance(value, bytes):
+        data = value
+    elif isinstance(value, str):
+        data = value.encode("utf-8")
+    else:
+        data = json.dumps(value, separators=(",", ":")).encode("utf-8")
+    return struct.pack("!i", len(data) + 1) + JSONB_VERSION + data
+
+
+def encode_date(value: Any) -> bytes:
+    return struct.pack("!ii", 4, (value - PG_EPOCH_DATE).days)
+
+
+def encode_datetime(value: Any) -> bytes:
+    delta = value - PG_EPOCH_DATETIME
+    micros = (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+    return struct.pack("!iq", 8, micros)
+
+
+def get_column_encoder(column) -> Callable[[Any], bytes]:
+    """
+    Get the binary COPY encoder for a SQLAlchemy column.
+    Integer columns map to int4 and Float columns to float8, matching the DDL
+    SQLAlchemy emits for this repo's models.
+    """
+    column_type = column.type
+    if isinstance(column_type, JSONB):
+        return encode_jsonb
+    if isinstance(column_type, Boolean):
+        return encode_bool
+    if isinstance(column_type, Integer):
+        return encode_int
+    if isinstance(column_type, Float):
+        return encode_float
+    if isinstance(column_type, DateTime):
+        return encode_datetime
+    if isinstance(column_type, Date):
+        return encode_date
+    if isinstance(column_type, String):
+        return encode_text
+
+    raise TypeError(f"Unsupported column type for COPY: {column.name} {column_type}")
+
+
+def get_insert_columns(table: Table) -> List[str]:
+    """
+    Get the names of the columns to write for a table, leaving out the
+    primary key so the database sequence assigns it. Primary key columns
+    declared with autoincrement=False, such as the season of partitioned
+    tables, are written.
+    """
+    return [
+        column.name
+        for column in table.columns
+        if not (column.primary_key and column.autoincrement is not False)
+    ]
+
+
+def object_rows(objects: Iterable[Any], columns: Sequence[str]) -> Iterator[tuple]:
+    """
+    Turn ORM instances into row tuples in the given column order.
+    """
+    for obj in objects:
+        yield tuple(getattr(obj, column) for column in columns)
+
+
+def dict_rows(rows: Iterable[Dict], columns: Sequence[str]) -> Iterator[tuple]:
+    """
+    Turn row dicts into row tuples in the given column order. Missing keys are
+    written as NULL.
+    """
+    for row in rows:
+        yield tuple(row.get(column) for column in columns)
+
+
+def get_encoders(table: Table, columns: Sequence[str]) -> List[Callable]:
+    return [get_column_encoder(table.columns[column]) for column in columns]
+
+
+def encode_rows(rows: Iterable[Sequence], encoders: List[Callable]) -> bytes:
+    """
+    Encode rows as binary COPY tuples, without the COPY header and trailer.
+    The result can be built in another process and handed to copy_encoded.
+    """
+    buffer = bytearray()
+    field_count = struct.pack("!h", len(encoders))
+    for row in rows:
+        buffer += field_count
+        for encoder, value in zip(encoders, row):
+            buffer += NULL_FIELD if value is None else encoder(value)
+    return bytes(buffer)
+
+
+class CopyStream:
+    """
+    File-like object that assembles a PostgreSQL binary COPY payload from
+    blocks of encoded rows lazily, so only a chunk of the payload is ever held
+    in memory.
+    """
+
+    def __init__(self, blocks: Iterable[bytes]):
+        self.blocks = iter(blocks)
+        self.buffer = bytearray(COPY_HEADER)
+        self.done = False
+
+    def read(self, size: int = -1) -> bytes:
+        while not self.done and (size < 0 or len(self.buffer) < size):
+            block = next(self.blocks, None)
+            if block is None:
+                self.buffer += COPY_TRAILER
+                self.done = True
+            else:
+                self.buffer += block
+
+        if size < 0:
+            size = len(self.buffer)
+        chunk = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return chunk
+
+
+def copy_encoded(
+    session: Session,
+    table: Table,
+    columns: Sequence[str],
+    blocks: Iterable[bytes],
+) -> None:
+    """
+    Stream blocks of rows already encoded with encode_rows into a table with
+    COPY ... FROM STDIN in binary format.
+    """
+    statement = (
+        f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT binary)"
+    )
+
+    dbapi_connection = session.connection().connection
+    with dbapi_connection.cursor() as cursor:
+        cursor.copy_expert(statement, CopyStream(blocks), size=1 << 20)
+
+
+def copy_rows(
+    session: Session,
+    table: Table,
+    columns: Sequence[str],
+    rows: Iterable[Sequence],
+) -> int:
+    """
+    Stream rows into a table with COPY ... FROM STDIN in binary format.
+
+    The rows are written on the session's connection, so they become visible
+    and durable together with the rest of the session's transaction.
+
+    Args:
+        session (Session): An open session; the caller is responsible for committing
+        table (Table): The target table (e.g. AtBat.__table__)
+        columns (Sequence[str]): The column names, in the same order as each row
+        rows (Iterable[Sequence]): Row tuples. JSONB values can be dicts or
+            pre-serialized JSON strings
+
+    Returns:
+        int: Number of rows written
+    """
+    encoders = get_encoders(table, columns)
+    row_count = 0
+
+    def blocks() -> Iterator[bytes]:
+        nonlocal row_count
+        remaining = iter(rows)
+        while chunk := list(islice(remaining, 1000)):
+            row_count += len(chunk)
+            yield encode_rows(chunk, encoders)
+
+    copy_encoded(session, table, columns, blocks())
+    return row_count
+
+
+def upsert_rows(
+    session: Session,
+    table: Table,
+    rows: Sequence[Dict],
+    key: str = "mlb_id",
+    batch_size: int = 1000,
+    ids: Optional[Dict[Any, int]] = None,
+) -> Dict[str, int]:
+    """
+    Insert or update rows with INSERT ... ON CONFLICT (key) DO UPDATE, one
+    statement per batch.
+
+    Rows are sorted by key first, so concurrent runs lock rows in the same
+    order and cannot deadlock. Inserted rows get created_at and updated_at
+    from now(). On conflict every given column is overwritten except
+    created_at, and updated_at is set to now(). Whether each row was
+    inserted or updated is read back from the statement itself: xmax is 0 only
+    for rows the statement inserted.
+
+    Args:
+        session (Session): An open session; the caller is responsible for committing
+        table (Table): The target table (e.g. Player.__table__)
+        rows (Sequence[Dict]): Rows keyed by column name, with unique keys
+        key (str): The unique column to upsert on
+        batch_size (int): Number of rows per statement
+        ids (Dict[Any, int], optional): If given, filled with the key -> id of
+            every upserted row, as returned by the statements
+
+    Returns:
+        Dict[str, int]: Number of rows "inserted" and "updated"
+    """
+    stats = {"inserted": 0, "updated": 0}
+    rows = sorted(rows, key=lambda row: row[key])
+
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start : start + batch_size]
+        timestamps = {
+            column: func.now()
+            for column in ("created_at", "updated_at")
+            if column in table.columns
+        }
+        statement = insert(table).values([{**row, **timestamps} for row in batch])
+        updates = {
+            column: statement.excluded[column]
+            for column in batch[0]
+            if column not in (key, "created_at")
+        }
+        if "updated_at" in table.columns:
+            updates["updated_at"] = func.now()
+        statement = statement.on_conflict_do_update(
+            index_elements=[key], set_=updates
+        ).returning(literal_column("xmax = 0"), table.c[key], table.c.id)
+
+        for inserted, row_key, row_id in session.execute(statement):
+            stats["inserted" if inserted else "updated"] += 1
+            if ids is not None:
+                ids[row_key] = row_id
+
+    return stats
@@ -49,3 +49,87 @@ SWUNG_AT_PITCH_CODES = [
     "Y",
     "Z",
 ]
+
+# On-disk cache for raw StatsAPI responses
+STATSAPI_CACHE_DIR = "~/.cache/mlb_pbp/statsapi"
+STATSAPI_CACHE_MAX_BYTES = 20 * 1024**3
+# Seconds a cached response stays valid, per endpoint. None means forever.
+STATSAPI_CACHE_TTLS = {
+    # Play-by-play of games not known to be final yet, which may still change.
+    # Once a game is final its play-by-play is cached for good.
+    "game_playByPlay": 10 * 60,
+    "teams": 24 * 60 * 60,
+    "sports_players": 24 * 60 * 60,
+    "schedule": 60 * 60,
+}
+STATSAPI_CACHE_DEFAULT_TTL = 60 * 60
+# Schedule statuses of finished games, matched as prefixes (e.g. "Final: Tied",
+# "Completed Early: Rain")
+FINAL_GAME_STATUSES = ("Final", "Game Over", "Completed Early")
+# Seasons fetched at once when syncing teams and players
+STATSAPI_SEASON_FETCH_WORKERS = 8
+# load_games requests the schedule in windows of this many days
+SCHEDULE_WINDOW_DAYS = 30
+SCHEDULE_FETCH_WORKERS = 4
+
+# On-disk snapshots of the mlb_id -> id maps kept by IdResolver
+ID_RESOLVER_CACHE_DIR = "~/.cache/mlb_pbp/ids"
+
+# Pipeline orchestrator: how many tasks of each stage may run at once. Teams
+# and players are upserted one league at a time since leagues share players.
+PIPELINE_STAGE_LIMITS = {
+    "teams": 1,
+    "players": 1,
+    "games": 2,
+    "at_bat_details": 4,
+    "at_bats": 2,
+    "pitches": 2,
+    "ingest_games": 4,
+    "pitch_snapshot": 1,
+}
+PIPELINE_CHECKPOINT_PATH = "~/.cache/mlb_pbp/pipeline_checkpoint.json"
+
+# Retry schedule for game_playByPlay fetches kept in the game_fetches ledger.
+# The delay doubles on every attempt, from the base up to the max. Games that
+# fail FETCH_MAX_ATTEMPTS times are marked as poison and no longer fetched.
+FETCH_RETRY_BASE_SECONDS = 15 * 60
+FETCH_RETRY_MAX_SECONDS = 7 * 24 * 60 * 60
+FETCH_MAX_ATTEMPTS = 6
+
+# Numeric "pitchData" fields of a pitch event stored as pitches columns:
+# column -> path under "pitchData"
+PITCH_DATA_FIELDS = {
+    "end_speed": ("endSpeed",),
+    "extension": ("extension",),
+    "plate_time": ("plateTime",),
+    "type_confidence": ("typeConfidence",),
+    "strike_zone_top": ("strikeZoneTop",),
+    "strike_zone_bottom": ("strikeZoneBottom",),
+    "px": ("coordinates", "pX"),
+    "pz": ("coordinates", "pZ"),
+    "pfx_x": ("coordinates", "pfxX"),
+    "pfx_z": ("coordinates", "pfxZ"),
+    "x0": ("coordinates", "x0"),
+    "y0": ("coordinates", "y0"),
+    "z0": ("coordinates", "z0"),
+    "vx0": ("coordinates", "vX0"),
+    "vy0": ("coordinates", "vY0"),
+    "vz0": ("coordinates", "vZ0"),
+    "ax": ("coordinates", "aX"),
+    "ay": ("coordinates", "aY"),
+    "az": ("coordinates", "aZ"),
+    "spin_rate": ("breaks", "spinRate"),
+    "spin_direction": ("breaks", "spinDirection"),
+    "break_angle": ("breaks", "breakAngle"),
+    "break_length": ("breaks", "breakLength"),
+    "break_y": ("breaks", "breakY"),
+    "break_vertical": ("breaks", "breakVertical"),
+    "break_vertical_induced": ("breaks", "breakVerticalInduced"),
+    "break_horizontal": ("breaks", "breakHorizontal"),
+}
+
+# Local Parquet snapshot of the joined pitch rows read by profiling_funcs,
+# partitioned by sport_id and season. Refreshes append pitches in batches of
+# PITCH_SNAPSHOT_BATCH_SIZE rows.
+PITCH_SNAPSHOT_DIR = "~/.cache/mlb_pbp/pitch_snapshot"
+PITCH_SNAPSHOT_BATCH_SIZE = 500_000
@@ -0,0 +1,201 @@
+import argparse
+from typing import Dict, List
+
+from sqlalchemy import and_, case, exists, func, literal_column, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from tabulate import tabulate
+
+from app.models import Game, GameFetch
+from app.scripts import db_engine
+from app.scripts.constants import (
+    FETCH_MAX_ATTEMPTS,
+    FETCH_RETRY_BASE_SECONDS,
+    FETCH_RETRY_MAX_SECONDS,
+)
+
+
+def is_fetch_due():
+    """
+    Correlated clause that is true when the Game in the enclosing query may be
+    fetched: it is not poison and it is not waiting for its next retry.
+    """
+    return ~exists().where(
+        GameFetch.game_mlb_id == Game.mlb_id,
+        or_(GameFetch.status == "poison", GameFetch.next_attempt_at > func.now()),
+    )
+
+
+def get_fetch_status(fetch: Dict) -> str:
+    if fetch["error"] is not None:
+        return "failed"
+    return "fetched" if fetch["at_bat_count"] else "empty"
+
+
+def get_retry_delay(attempts):
+    """
+    Interval to wait before the next fetch of a game that was attempted
+    attempts times: FETCH_RETRY_BASE_SECONDS, doubled on every attempt up to
+    FETCH_RETRY_MAX_SECONDS.
+    """
+    delay = func.least(
+        FETCH_RETRY_MAX_SECONDS,
+        FETCH_RETRY_BASE_SECONDS * func.power(2, attempts - 1),
+    )
+    return delay * literal_column("interval '1 second'")
+
+
+def record_fetches(session: Session, fetches: List[Dict]) -> None:
+    """
+    Record fetch attempts in the ledger. Call it on the session that wrote the
+    fetched rows, before committing, so the ledger only advances together with
+    the data.
+
+    Args:
+        session (Session): The session that wrote the games' rows
+        fetches (List[Dict]): One dict per game with game_mlb_id, sport_id,
+            season, at_bat_count, payload_bytes, latency (seconds) and error
+            (None when the fetch succeeded)
+    """
+    if not fetches:
+        return
+
+    values = [
+        {
+            "game_mlb_id": fetch["game_mlb_id"],
+            "sport_id": fetch["sport_id"],
+            "season": fetch["season"],
+            "status": get_fetch_status(fetch),
+            "attempts": 1,
+            "last_error": fetch["error"],
+            "payload_bytes": fetch["payload_bytes"],
+            "latency": fetch["latency"],
+            "at_bat_count": fetch["at_bat_count"],
+            "last_attempt_at": func.now(),
+            "next_attempt_at": (
+                None
+                if get_fetch_status(fetch) == "fetched"
+                else func.now() + get_retry_delay(1)
+            ),
+        }
+        # Sorted so concurrent loaders lock ledger rows in the same order
+        for fetch in sorted(fetches, key=lambda fetch: fetch["game_mlb_id"])
+    ]
+    statement = insert(GameFetch).values(values)
+    excluded = statement.excluded
+    attempts = GameFetch.attempts + 1
+    status = case(
+        (
+            and_(excluded.status == "failed", attempts >= FETCH_MAX_ATTEMPTS),
+            "poison",
+        ),
+        else_=excluded.status,
+    )
+    session.execute(
+        statement.on_conflict_do_update(
+            index_elements=["game_mlb_id"],
+            set_={
+                "status": status,
+                "attempts": attempts,
+                "last_error": excluded.last_error,
+                "payload_bytes": excluded.payload_bytes,
+                "latency": excluded.latency,
+                "at_bat_count": excluded.at_bat_count,
+                "last_attempt_at": excluded.last_attempt_at,
+                # Fetched and poison games are not retried
+                "next_attempt_at": case(
+                    (status.in_(["fetched", "poison"]), None),
+                    else_=func.now() + get_retry_delay(attempts),
+                ),
+            },
+        )
+    )
+
+
+def reset_poison_games(sport_id: int, season: int = None) -> int:
+    """
+    Make poison games of a league (and season) fetchable again on the next run.
+
+    Returns:
+        int: The number of games reset
+    """
+    query = (
+        update(GameFetch)
+        .where(GameFetch.sport_id == sport_id, GameFetch.status == "poison")
+        .values(status="failed", attempts=0, next_attempt_at=None)
+    )
+    if season is not None:
+        query = query.where(GameFetch.season == season)
+    with Session(db_engine) as session:
+        result = session.execute(query)
+        session.commit()
+        return result.rowcount
+
+
+def get_fetch_summary(sport_id: int = None, season: int = None) -> List[Dict]:
+    """
+    Get the number of games per fetch status for every league and season, with
+    their fetch throughput.
+
+    Args:
+        sport_id (int, optional): If provided, only this league
+        season (int, optional): If provided, only this season
+
+    Returns:
+        List[Dict]: One row per (sport_id, season, status)
+    """
+    query = (
+        select(
+            GameFetch.sport_id,
+            GameFetch.season,
+            GameFetch.status,
+            func.count().label("games"),
+            func.sum(GameFetch.at_bat_count).label("at_bats"),
+            func.sum(GameFetch.payload_bytes).label("payload_bytes"),
+            func.avg(GameFetch.latency).label("avg_latency"),
+            func.max(GameFetch.latency).label("max_latency"),
+            (
+                func.sum(GameFetch.payload_bytes)
+                / func.nullif(func.sum(GameFetch.latency), 0)
+            ).label("bytes_per_second"),
+            func.min(GameFetch.next_attempt_at).label("next_attempt_at"),
+        )
+        .group_by(GameFetch.sport_id, GameFetch.season, GameFetch.status)
+        .order_by(GameFetch.sport_id, GameFetch.season, GameFetch.status)
+    )
+    if sport_id is not None:
+        query = query.where(GameFetch.sport_id == sport_id)
+    if season is not None:
+        query = query.where(GameFetch.season == season)
+
+    with Session(db_engine) as session:
+        return [dict(row._mapping) for row in session.execute(query)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Show the game fetch ledger, or reset its poison games"
+    )
+    parser.add_argument("--sport-id", type=int, help="ID of the league")
+    parser.add_argument("--season", type=int, help="Season to show")
+    parser.add_argument(
+        "--reset-poison",
+        action="store_true",
+        help="Fetch the league's poison games again on the next run",
+    )
+    args = parser.parse_args()
+
+    if args.reset_poison:
+        if args.sport_id is None:
+            parser.error("--reset-poison requires --sport-id")
+        reset = reset_poison_games(args.sport_id, args.season)
+        print(f"Reset {reset} poison games")
+
+    print(
+        tabulate(
+            get_fetch_summary(args.sport_id, args.season),
+            headers="keys",
+            tablefmt="github",
+            floatfmt=".3f",
+        )
+    )
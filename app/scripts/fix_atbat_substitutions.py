@@ -1,83 +1,120 @@
 import argparse
 from datetime import datetime
-from typing import Dict
-from app.models import AtBat, Player, Game
+from typing import List
 
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 from app.scripts import db_engine
+from app.scripts.pitch_snapshot import invalidate_pitch_snapshot
 
 
-def get_player_id_mappings() -> Dict[int, int]:
-    # Fetch all players for given league and season
-    with Session(db_engine) as session:
-        players = session.query(Player).all()
-        # Return a dictionary of mlb_id: id
-        return {player.mlb_id: player.id for player in players}
-
+SUBSTITUTION_EVENT_TYPES = ["pitching_substitution", "offensive_substitution"]
 
-def get_league_season_game_ids(sport_id: int, season: int) -> Dict[int, int]:
-    # Fetch all games for given league and season
-    with Session(db_engine) as session:
-        games = (
-            session.query(Game)
-            .filter(Game.sport_id == sport_id, Game.season == season)
-            .all()
-        )
-        # Return a dictionary of mlb_id: id
-        return {game.mlb_id: game.id for game in games}
+# For every at-bat of the league and season, take the last substitution
+# action of each type whose player is known, and point pitcher/batter at that
+# player. Only rows where one of them actually changes are updated. at_bats
+# is filtered on the season on both sides, so only that season's partitions
+# of at_bats and at_bat_details are read.
+FIX_SUBSTITUTIONS_SQL = text(
+    """
+    WITH events AS (
+        SELECT
+            ab.id AS at_bat_id,
+            ab.season,
+            event.ordinality,
+            event.value #>> '{details,eventType}' AS event_type,
+            (event.value #>> '{player,id}')::int AS player_mlb_id
+        FROM at_bats ab
+        JOIN games g ON g.mlb_id = ab.game_mlb_id
+        JOIN at_bat_details abd
+            ON abd.id = ab.at_bat_details_id AND abd.season = ab.season
+        CROSS JOIN LATERAL jsonb_path_query(
+            abd.details,
+            '$.playEvents[*] ? (@.type == "action")'
+        ) WITH ORDINALITY AS event (value, ordinality)
+        WHERE ab.season = :season
+        AND ab.sport_id = :sport_id
+        AND g.sport_id = :sport_id
+        AND g.season = :season
+        AND event.value #>> '{details,eventType}' = ANY(:event_types)
+    ),
+    last_events AS (
+        SELECT DISTINCT ON (e.at_bat_id, e.event_type)
+            e.at_bat_id,
+            e.season,
+            e.event_type,
+            p.id AS player_id,
+            p.mlb_id AS player_mlb_id
+        FROM events e
+        JOIN players p ON p.mlb_id = e.player_mlb_id
+        ORDER BY e.at_bat_id, e.event_type, e.ordinality DESC
+    ),
+    substitutions AS (
+        SELECT
+            at_bat_id,
+            season,
+            MAX(player_id) FILTER (WHERE event_type = 'pitching_substitution') AS pitcher_id,
+            MAX(player_mlb_id) FILTER (WHERE event_type = 'pitching_substitution') AS pitcher_mlb_id,
+            MAX(player_id) FILTER (WHERE event_type = 'offensive_substitution') AS batter_id,
+            MAX(player_mlb_id) FILTER (WHERE event_type = 'offensive_substitution') AS batter_mlb_id
+        FROM last_events
+        GROUP BY at_bat_id, season
+    )
+    UPDATE at_bats ab
+    SET
+        pitcher_id = COALESCE(s.pitcher_id, ab.pitcher_id),
+        pitcher_mlb_id = COALESCE(s.pitcher_mlb_id, ab.pitcher_mlb_id),
+        batter_id = COALESCE(s.batter_id, ab.batter_id),
+        batter_mlb_id = COALESCE(s.batter_mlb_id, ab.batter_mlb_id)
+    FROM substitutions s
+    WHERE ab.id = s.at_bat_id
+    AND ab.season = s.season
+    AND ab.season = :season
+    AND (
+        (s.pitcher_id IS NOT NULL AND ab.pitcher_id IS DISTINCT FROM s.pitcher_id)
+        OR (s.batter_id IS NOT NULL AND ab.batter_id IS DISTINCT FROM s.batter_id)
+    )
+    """
+)
 
 
 def fix_at_bats(
-    sport_id: int, start_season: int, end_season: int, event_type: str
+    sport_id: int,
+    start_season: int,
+    end_season: int,
+    event_types: List[str] = SUBSTITUTION_EVENT_TYPES,
 ) -> None:
-    player_id_mappings = get_player_id_mappings()
+    """
+    Point each AtBat's pitcher (pitching_substitution) and batter
+    (offensive_substitution) at the player from the last substitution action
+    of its playEvents, in a single UPDATE per season run by the database.
+    The pitch snapshot is invalidated if any AtBat changed.
+
+    Args:
+        sport_id (int): The ID of the sport/league
+        start_season (int): First season to fix
+        end_season (int): Season to stop at (exclusive)
+        event_types (List[str]): The substitution event types to apply
+    """
     with Session(db_engine) as session:
         # Iterate over the range of seasons
         for season in range(start_season, end_season):
             start_time = datetime.now()
-            season_game_mlb_ids = get_league_season_game_ids(sport_id, season).keys()
-            at_bats = (
-                session.query(AtBat)
-                .filter(
-                    AtBat.sport_id == sport_id,
-                    AtBat.game_mlb_id.in_(season_game_mlb_ids),
-                )
-                .all()
+            result = session.execute(
+                FIX_SUBSTITUTIONS_SQL,
+                {
+                    "sport_id": sport_id,
+                    "season": season,
+                    "event_types": list(event_types),
+                },
             )
-            fixed_ab_count = 0
-            for ab in at_bats:
-                details = ab.details
-                play_events = details.get("playEvents", [])
-                for ev in play_events:
-                    if ev.get("type") == "action":
-                        description = ev.get("details", {}).get("eventType")
-                        if description == event_type:
-                            new_player_mlb_id = ev.get("player", {}).get("id")
-                            if new_player_mlb_id:
-                                new_player_id = player_id_mappings.get(
-                                    new_player_mlb_id
-                                )
-                                if not new_player_id:
-                                    print(
-                                        f"Player with mlb_id {new_player_mlb_id} not found"
-                                    )
-                                    continue
-
-                                if event_type == "pitching_substitution":
-                                    ab.pitcher_id = new_player_id
-                                    ab.pitcher_mlb_id = new_player_mlb_id
-                                elif event_type == "offensive_substitution":
-                                    ab.batter_id = new_player_id
-                                    ab.batter_mlb_id = new_player_mlb_id
-                                fixed_ab_count += 1
-
-            session.bulk_save_objects(at_bats)
+            session.commit()
+            if result.rowcount:
+                invalidate_pitch_snapshot()
             print(
-                f"Fixed {fixed_ab_count} AtBats for season {season} in {(datetime.now() - start_time) / 60} minutes"
+                f"Fixed {result.rowcount} AtBats for season {season} in {(datetime.now() - start_time).total_seconds() / 60:.2f} minutes"
             )
 
-        session.commit()
-
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Load AtBats data")
@@ -85,9 +122,18 @@ if __name__ == "__main__":
     parser.add_argument("--start-season", type=int, required=True, help="Start season")
     parser.add_argument("--end-season", type=int, required=True, help="End season")
     parser.add_argument(
-        "--event-type", type=str, required=True, help="Event type to fix"
+        "--event-type",
+        type=str,
+        choices=SUBSTITUTION_EVENT_TYPES,
+        action="append",
+        help="Event type to fix. Can be repeated; defaults to all of them.",
     )
 
     args = parser.parse_args()
 
-    fix_at_bats(args.sport_id, args.start_season, args.end_season, args.event_type)
+    fix_at_bats(
+        args.sport_id,
+        args.start_season,
+        args.end_season,
+        args.event_type or SUBSTITUTION_EVENT_TYPES,
+    )
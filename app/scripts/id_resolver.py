@@ -0,0 +1,192 @@
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.scripts import db_engine
+from app.scripts.constants import ID_RESOLVER_CACHE_DIR
+
+
+class IdResolver:
+    """
+    Compact mlb_id -> id map for a table with mlb_id and id columns (e.g.
+    Player).
+
+    Only (mlb_id, id) pairs are loaded, into two sorted int64 arrays that are
+    searched with np.searchsorted. The upserts never change the id of an
+    mlb_id, so refresh() only reads the rows with an id above the highest one
+    seen so far. The arrays can be saved to and loaded from a local file, so
+    a new process only has to catch up on recent changes. Deleted rows are not
+    picked up until the file is removed.
+
+    Ids are taken from a sequence when inserted but committed in any order,
+    so a refresh can move past the ids of a concurrent upsert that is not
+    committed yet. Writers add() the pairs their own upsert returned instead
+    of relying on refresh() to see them.
+
+    Both arrays are swapped in as one tuple, so lookups from other threads
+    never see a half-applied refresh.
+    """
+
+    def __init__(self, model, cache_dir: Optional[str] = ID_RESOLVER_CACHE_DIR):
+        self.model = model
+        self.pairs = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+        self.max_id = None
+        self.lock = threading.Lock()
+        self.path = (
+            Path(cache_dir).expanduser() / f"{model.__tablename__}.npz"
+            if cache_dir
+            else None
+        )
+
+    @property
+    def mlb_ids(self) -> np.ndarray:
+        return self.pairs[0]
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self.pairs[1]
+
+    def __len__(self) -> int:
+        return len(self.mlb_ids)
+
+    def __getstate__(self) -> dict:
+        # Locks cannot be pickled, e.g. when sent to worker processes
+        state = self.__dict__.copy()
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def __contains__(self, mlb_id: int) -> bool:
+        return self.get(mlb_id) is not None
+
+    def get(self, mlb_id: int, default: Optional[int] = None) -> Optional[int]:
+        if mlb_id is None:
+            return default
+        mlb_ids, ids = self.pairs
+        i = np.searchsorted(mlb_ids, mlb_id)
+        if i < len(mlb_ids) and mlb_ids[i] == mlb_id:
+            return int(ids[i])
+        return default
+
+    def get_many(self, mlb_ids: Iterable[int]) -> List[Optional[int]]:
+        """
+        Resolve many mlb_ids with one vectorized search. Unknown (or None)
+        mlb_ids resolve to None.
+        """
+        known_mlb_ids, known_ids = self.pairs
+        values = np.array([-1 if v is None else v for v in mlb_ids], dtype=np.int64)
+        positions = np.searchsorted(known_mlb_ids, values)
+        positions = np.minimum(positions, max(len(known_mlb_ids) - 1, 0))
+        found = (
+            known_mlb_ids[positions] == values
+            if len(known_mlb_ids)
+            else np.zeros(len(values), dtype=bool)
+        )
+        ids = known_ids[positions] if len(known_ids) else values
+        return [int(id) if ok else None for id, ok in zip(ids, found)]
+
+    def refresh(self) -> int:
+        """
+        Load the pairs of rows inserted since the last refresh (all rows the
+        first time) and merge them in.
+
+        Returns:
+            int: Number of rows read
+        """
+        with self.lock:
+            query = select(self.model.mlb_id, self.model.id)
+            if self.max_id is not None:
+                query = query.where(self.model.id > self.max_id)
+
+            with Session(db_engine) as session:
+                rows = session.execute(query).all()
+            if not rows:
+                return 0
+
+            mlb_ids, ids = zip(*rows)
+            self.merge(np.array(mlb_ids, dtype=np.int64), np.array(ids, dtype=np.int64))
+            self.max_id = max(ids)
+            return len(rows)
+
+    def add(self, mlb_ids: Iterable[int], ids: Iterable[int]) -> None:
+        """
+        Merge in pairs known to be committed, e.g. returned by an upsert. The
+        watermark is left alone, so no concurrently written id is skipped.
+        """
+        with self.lock:
+            self.merge(
+                np.fromiter(mlb_ids, dtype=np.int64), np.fromiter(ids, dtype=np.int64)
+            )
+
+    def merge(self, mlb_ids: np.ndarray, ids: np.ndarray) -> None:
+        keep = ~np.isin(self.mlb_ids, mlb_ids)
+        mlb_ids = np.concatenate([self.mlb_ids[keep], mlb_ids])
+        ids = np.concatenate([self.ids[keep], ids])
+        order = np.argsort(mlb_ids, kind="stable")
+        self.pairs = (mlb_ids[order], ids[order])
+
+    def load(self) -> bool:
+        if self.path is None or not self.path.exists():
+            return False
+        with np.load(self.path) as snapshot:
+            # Older snapshots kept an updated_at watermark, reload those
+            if "max_id" not in snapshot:
+                return False
+            self.pairs = (snapshot["mlb_ids"], snapshot["ids"])
+            self.max_id = snapshot["max_id"].item()
+        return True
+
+    def save(self) -> None:
+        if self.path is None or self.max_id is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.lock:
+            # A temp file per thread, then an atomic rename over the snapshot
+            tmp_path = self.path.with_suffix(f".{threading.get_ident()}.npz")
+            mlb_ids, ids = self.pairs
+            np.savez(
+                tmp_path,
+                mlb_ids=mlb_ids,
+                ids=ids,
+                max_id=np.array(self.max_id, dtype=np.int64),
+            )
+            tmp_path.replace(self.path)
+
+
+@lru_cache()
+def get_resolver(model) -> IdResolver:
+    """
+    Get the shared IdResolver for a model, loaded from its local snapshot and
+    brought up to date with the database. Call refresh() on it to pick up rows
+    written since.
+    """
+    resolver = IdResolver(model)
+    resolver.load()
+    if resolver.refresh():
+        resolver.save()
+    return resolver
+
+
+def refresh_resolver(model, written_ids: Optional[Dict[int, int]] = None) -> None:
+    """
+    Bring the shared IdResolver of a model up to date after rows were written,
+    and save its snapshot for the next process.
+
+    Args:
+        model: The model whose rows were written (e.g. Player)
+        written_ids (Dict[int, int], optional): mlb_id -> id of the rows the
+            caller committed, merged in even if refresh() skips past them
+    """
+    resolver = get_resolver(model)
+    if written_ids:
+        resolver.add(written_ids.keys(), written_ids.values())
+    if resolver.refresh() or written_ids:
+        resolver.save()
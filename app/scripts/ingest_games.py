@@ -0,0 +1,301 @@
+import argparse
+import json
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+
+from app.models import AtBat, AtBatDetails, Game, Pitch, Player
+from app.schemas import AtBatDetailsSchema, AtBatSchema, PitchSchema
+from app.scripts import db_engine
+from app.scripts.async_fetch import iter_at_bats_for_games
+from app.scripts.bulk_write import copy_rows, dict_rows
+from app.scripts.constants import LEAGUE_MAP
+from app.scripts.fetch_ledger import is_fetch_due, record_fetches
+from app.scripts.id_resolver import get_resolver
+from app.scripts.ingestion_state import (
+    STAGES,
+    get_pending_games_filter,
+    mark_games_completed,
+)
+from app.scripts.load_at_bat_details import (
+    AT_BAT_DETAILS_COLUMNS,
+    iter_at_bats_with_thread_pool,
+)
+from app.scripts.load_at_bats import AT_BAT_COLUMNS, build_at_bat_row
+from app.scripts.load_pitches import PITCH_COLUMNS, build_pitch_rows
+from app.scripts.partitions import ensure_season_partitions
+from app.scripts.statsapi_cache import is_final_game_status
+from app.validation import validate_batch
+
+
+def get_games_to_ingest(
+    sport_id: int, season: int = None
+) -> List[Tuple[int, int, datetime.date, int, str]]:
+    """
+    Get the games that are not done yet for the at_bat_details stage and are
+    due for a fetch according to the game_fetches ledger.
+
+    Args:
+        sport_id (int): The ID of the sport/league
+        season (int, optional): If provided, only check games from this season
+
+    Returns:
+        List[Tuple[int, int, datetime.date, int, str]]: (game_mlb_id, game_id,
+        game_date, season, status) for every game to ingest
+    """
+    with Session(db_engine) as session:
+        games_query = select(
+            Game.mlb_id,
+            Game.id,
+            Game.game_date,
+            Game.season,
+            Game.details["status"].astext,
+        ).where(
+            get_pending_games_filter("at_bat_details", sport_id, season),
+            is_fetch_due(),
+        )
+        return session.execute(games_query).all()
+
+
+def allocate_ids(session: Session, table_name: str, count: int) -> List[int]:
+    """
+    Reserve count ids from a table's id sequence in one round-trip, so rows can
+    reference each other (at_bats their at_bat_details, pitches their at_bats)
+    before any of them is written.
+    """
+    if not count:
+        return []
+    return (
+        session.execute(
+            text(
+                "SELECT nextval(pg_get_serial_sequence(:table_name, 'id')) "
+                "FROM generate_series(1, :count)"
+            ),
+            {"table_name": table_name, "count": count},
+        )
+        .scalars()
+        .all()
+    )
+
+
+def build_game_rows(
+    game_at_bats: List[Dict],
+    at_bat_details_ids: List[int],
+    sport_id: int,
+    season: int,
+    game_id: int,
+    game_mlb_id: int,
+    player_id_mappings: Dict[int, int],
+) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Build and validate the at_bat_details and at_bats rows for one game from
+    its "game_playByPlay" at-bats, the same way load_at_bat_details and
+    load_at_bats would. Each play gets the at_bat_details id reserved for it
+    in at_bat_details_ids.
+
+    Returns:
+        Tuple[List[Dict], List[Dict]]: The at_bat_details rows and the at_bats
+        rows pointing at them
+    """
+    at_bat_details, errors = validate_batch(
+        AtBatDetailsSchema,
+        [
+            {
+                "id": at_bat_details_id,
+                "game_mlb_id": game_mlb_id,
+                "sport_id": sport_id,
+                "season": season,
+                "details": details,
+            }
+            for at_bat_details_id, details in zip(at_bat_details_ids, game_at_bats)
+        ],
+    )
+    for i, error in errors:
+        print(f"Failed validation for AB {i} in game {game_mlb_id}, error: {error}")
+
+    at_bats = []
+    for row in at_bat_details:
+        at_bat = build_at_bat_row(
+            row["details"],
+            row["id"],
+            row["season"],
+            sport_id,
+            game_id,
+            game_mlb_id,
+            player_id_mappings,
+        )
+        if at_bat is not None:
+            at_bats.append(at_bat)
+
+    at_bats, errors = validate_batch(AtBatSchema, at_bats)
+    for i, error in errors:
+        print(f"Error validating AtBat {i} in game {game_mlb_id}")
+        print(error)
+
+    return at_bat_details, at_bats
+
+
+def ingest_games(sport_id: int, season: int = None, async_fetch: bool = False) -> None:
+    """
+    Ingest at_bat_details, at_bats and pitches for every game that has no
+    AtBatDetails yet, in a single pass over the "game_playByPlay" responses.
+
+    Each game's rows for all three tables are built from the fetched JSON and
+    written in one transaction, so nothing is read back from the database.
+    The plays are stored once, in at_bat_details, which the at_bats rows point
+    at through ids reserved up front.
+    load_at_bat_details, load_at_bats and load_pitches remain the tools to fill
+    in any table that is missing rows.
+
+    Args:
+        sport_id (int): The ID of the sport/league
+        season (int, optional): If provided, only process games from this season
+        async_fetch (bool): Fetch play-by-play data with the adaptive asyncio
+            fetcher instead of a fixed pool of 10 threads
+    """
+    games_to_ingest = get_games_to_ingest(sport_id, season)
+    player_id_mappings = get_resolver(Player)
+    start_time = datetime.now()
+    print(
+        f"Ingesting {len(games_to_ingest)} games for the {LEAGUE_MAP[sport_id]['name']} league"
+        + (f" in season {season}" if season else "")
+    )
+
+    games = {
+        game_mlb_id: (game_id, game_date, game_season)
+        for game_mlb_id, game_id, game_date, game_season, _ in games_to_ingest
+    }
+    final_game_ids = {
+        game_mlb_id
+        for game_mlb_id, _, _, _, status in games_to_ingest
+        if is_final_game_status(status)
+    }
+    ensure_season_partitions(
+        game_date.year if game_date else game_season
+        for _, game_date, game_season in games.values()
+    )
+    if async_fetch:
+        fetched_games = iter_at_bats_for_games(
+            list(games), final_game_ids=final_game_ids
+        )
+    else:
+        fetched_games = iter_at_bats_with_thread_pool(
+            list(games), final_game_ids=final_game_ids
+        )
+
+    stats = {"games": 0, "at_bat_details": 0, "at_bats": 0, "pitches": 0}
+    with Session(db_engine) as session:
+        for game_mlb_id, game_at_bats, fetch in fetched_games:
+            game_id, game_date, game_season = games[game_mlb_id]
+            at_bat_details, at_bats = build_game_rows(
+                game_at_bats,
+                allocate_ids(session, "at_bat_details", len(game_at_bats)),
+                sport_id,
+                game_date.year if game_date else game_season,
+                game_id,
+                game_mlb_id,
+                player_id_mappings,
+            )
+
+            plays = {row["id"]: row["details"] for row in at_bat_details}
+            pitches = []
+            at_bat_ids = allocate_ids(session, "at_bats", len(at_bats))
+            for at_bat_id, at_bat in zip(at_bat_ids, at_bats):
+                at_bat["id"] = at_bat_id
+                play = plays[at_bat["at_bat_details_id"]]
+                pitches.extend(
+                    build_pitch_rows(
+                        at_bat_id, at_bat["season"], play.get("playEvents", [])
+                    )
+                )
+
+            pitches_to_persist, errors = validate_batch(PitchSchema, pitches)
+            for i, error in errors:
+                print(
+                    f"Error validating pitch {pitches[i]['pitch_index']} of AtBat {pitches[i]['at_bat_id']}: {error}"
+                )
+
+            # Serialize each play once; the COPY writer passes strings through
+            payload_bytes = 0
+            for row in at_bat_details:
+                row["details"] = json.dumps(row["details"])
+                payload_bytes += len(row["details"])
+
+            copy_rows(
+                session,
+                AtBatDetails.__table__,
+                ["id"] + AT_BAT_DETAILS_COLUMNS,
+                dict_rows(at_bat_details, ["id"] + AT_BAT_DETAILS_COLUMNS),
+            )
+            copy_rows(
+                session,
+                AtBat.__table__,
+                ["id"] + AT_BAT_COLUMNS,
+                dict_rows(at_bats, ["id"] + AT_BAT_COLUMNS),
+            )
+            copy_rows(
+                session,
+                Pitch.__table__,
+                PITCH_COLUMNS,
+                dict_rows(pitches_to_persist, PITCH_COLUMNS),
+            )
+            # Games without plays (e.g. not played yet) stay pending
+            if at_bat_details:
+                for stage in STAGES:
+                    mark_games_completed(
+                        session, stage, sport_id, [(game_mlb_id, game_season)]
+                    )
+            record_fetches(
+                session,
+                [
+                    {
+                        "game_mlb_id": game_mlb_id,
+                        "sport_id": sport_id,
+                        "season": game_season,
+                        "at_bat_count": len(game_at_bats),
+                        "payload_bytes": payload_bytes,
+                        **fetch,
+                    }
+                ],
+            )
+            session.commit()
+
+            stats["games"] += 1
+            stats["at_bat_details"] += len(at_bat_details)
+            stats["at_bats"] += len(at_bats)
+            stats["pitches"] += len(pitches_to_persist)
+            print(
+                f"Ingested {len(at_bats)} at-bats and {len(pitches_to_persist)} pitches for game {game_mlb_id} "
+                f"({stats['games']}/{len(games_to_ingest)} games done)"
+            )
+
+    print(
+        f"Wrote {stats['at_bat_details']} at bat details, {stats['at_bats']} at bats and {stats['pitches']} pitches "
+        f"for {stats['games']} games in {(datetime.now() - start_time).total_seconds() / 60:.2f} minutes"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Ingest at-bat details, at-bats and pitches in a single pass"
+    )
+    parser.add_argument("--sport-id", type=int, required=True, help="ID of the league")
+    parser.add_argument(
+        "--season",
+        type=int,
+        help="Season to process. If not provided, processes all seasons.",
+    )
+    parser.add_argument(
+        "--async-fetch",
+        action="store_true",
+        help="Use the asyncio fetcher with adaptive concurrency.",
+    )
+    args = parser.parse_args()
+
+    print(
+        f"Ingesting games for sport {args.sport_id}"
+        + (f" for season {args.season}" if args.season else "")
+    )
+    ingest_games(args.sport_id, args.season, args.async_fetch)
@@ -0,0 +1,141 @@
+import argparse
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import and_, exists, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from tabulate import tabulate
+
+from app.models import Game, IngestionState
+from app.scripts import db_engine
+
+
+STAGES = ["at_bat_details", "at_bats", "pitches"]
+
+# A game is only pending for a stage once the stage it reads from is done
+PREVIOUS_STAGE = {"at_bats": "at_bat_details", "pitches": "at_bats"}
+
+
+def is_stage_completed(stage: str, sport_id: int):
+    """
+    Correlated EXISTS clause that is true when the Game in the enclosing query
+    is done for the given stage. It is answered by a single probe of
+    idx_ingestion_state_key.
+    """
+    return exists().where(
+        IngestionState.stage == stage,
+        IngestionState.sport_id == sport_id,
+        IngestionState.season == Game.season,
+        IngestionState.game_mlb_id == Game.mlb_id,
+    )
+
+
+def get_pending_games_filter(stage: str, sport_id: int, season: int = None):
+    """
+    Filter on Game for the games a stage still has to process: games of the
+    league (and season) that are done for the previous stage but not for this
+    one.
+
+    Args:
+        stage (str): One of STAGES
+        sport_id (int): The ID of the sport/league
+        season (int, optional): If provided, only games from this season
+    """
+    conditions = [Game.sport_id == sport_id, ~is_stage_completed(stage, sport_id)]
+    if stage in PREVIOUS_STAGE:
+        conditions.append(is_stage_completed(PREVIOUS_STAGE[stage], sport_id))
+    if season is not None:
+        conditions.append(Game.season == season)
+    return and_(*conditions)
+
+
+def mark_games_completed(
+    session: Session, stage: str, sport_id: int, games: Iterable[Tuple[int, int]]
+) -> None:
+    """
+    Record games as done for a stage. Call it on the session that wrote the
+    rows, before committing, so the state only advances together with the data.
+
+    Args:
+        session (Session): The session that wrote the games' rows
+        stage (str): One of STAGES
+        sport_id (int): The ID of the sport/league
+        games (Iterable[Tuple[int, int]]): (game_mlb_id, season) pairs
+    """
+    values = [
+        {
+            "stage": stage,
+            "sport_id": sport_id,
+            "season": season,
+            "game_mlb_id": game_mlb_id,
+        }
+        for game_mlb_id, season in games
+    ]
+    if not values:
+        return
+    session.execute(
+        insert(IngestionState)
+        .values(values)
+        .on_conflict_do_nothing(
+            index_elements=["stage", "sport_id", "season", "game_mlb_id"]
+        )
+    )
+
+
+def get_progress(sport_id: int = None, season: int = None) -> List[Dict]:
+    """
+    Get the number of games done per stage for every league and season.
+
+    Args:
+        sport_id (int, optional): If provided, only this league
+        season (int, optional): If provided, only this season
+
+    Returns:
+        List[Dict]: One row per (sport_id, season) with the number of games and
+        the number of games done for each stage
+    """
+    with Session(db_engine) as session:
+        query = (
+            select(
+                Game.sport_id,
+                Game.season,
+                func.count(Game.id.distinct()).label("games"),
+                *[
+                    func.count(IngestionState.id)
+                    .filter(IngestionState.stage == stage)
+                    .label(stage)
+                    for stage in STAGES
+                ],
+            )
+            .outerjoin(
+                IngestionState,
+                and_(
+                    IngestionState.game_mlb_id == Game.mlb_id,
+                    IngestionState.sport_id == Game.sport_id,
+                    IngestionState.season == Game.season,
+                ),
+            )
+            .where(Game.sport_id.is_not(None))
+            .group_by(Game.sport_id, Game.season)
+            .order_by(Game.sport_id, Game.season)
+        )
+
+        if sport_id is not None:
+            query = query.where(Game.sport_id == sport_id)
+        if season is not None:
+            query = query.where(Game.season == season)
+
+        return [dict(row._mapping) for row in session.execute(query)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show ingestion progress per stage")
+    parser.add_argument("--sport-id", type=int, help="ID of the league")
+    parser.add_argument("--season", type=int, help="Season to show")
+    args = parser.parse_args()
+
+    print(
+        tabulate(
+            get_progress(args.sport_id, args.season), headers="keys", tablefmt="github"
+        )
+    )
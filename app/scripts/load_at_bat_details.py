@@ -1,86 +1,129 @@
 import argparse
 import concurrent.futures
+import json
+import time
 from datetime import datetime
-from typing import List, Dict
+from typing import Dict, Iterator, List, Set, Tuple
 
-import statsapi
 from app.models import Game, AtBatDetails
 from app.scripts.constants import LEAGUE_MAP
+from app.scripts.statsapi_cache import cached_get, is_final_game_status
 from sqlalchemy.orm import Session
 from sqlalchemy import select
 from app.schemas import AtBatDetailsSchema
+from app.validation import validate_batch
+from app.scripts.async_fetch import iter_at_bats_for_games
+from app.scripts.bulk_write import copy_rows, dict_rows, get_insert_columns
+from app.scripts.fetch_ledger import is_fetch_due, record_fetches
+from app.scripts.ingestion_state import get_pending_games_filter, mark_games_completed
+from app.scripts.partitions import ensure_season_partitions
+from app.scripts.utils import get_at_bat_plays
 
 
 from . import db_engine
 
+AT_BAT_DETAILS_COLUMNS = get_insert_columns(AtBatDetails.__table__)
+
 
 def get_games_without_at_bats(sport_id: int, season: int = None) -> List[tuple]:
     """
-    Get a list of game MLB IDs that don't have any corresponding AtBatDetails records.
+    Get the games that are not done yet for the at_bat_details stage and are
+    due for a fetch according to the game_fetches ledger.
 
     Args:
         sport_id (int): The ID of the sport/league
         season (int, optional): If provided, only check games from this season
 
     Returns:
-        List[tuple]: List of tuples containing (game_mlb_id, game_date) for games needing at-bat details
+        List[tuple]: List of tuples containing (game_mlb_id, game_date, season, status) for games needing at-bat details
     """
     with Session(db_engine) as session:
-        # Build base query for games
-        games_query = select(Game.mlb_id, Game.game_date).where(
-            Game.sport_id == sport_id
+        games_query = select(
+            Game.mlb_id, Game.game_date, Game.season, Game.details["status"].astext
+        ).where(
+            get_pending_games_filter("at_bat_details", sport_id, season),
+            is_fetch_due(),
         )
+        return session.execute(games_query).all()
 
-        # Add season filter if provided
-        if season is not None:
-            games_query = games_query.where(Game.season == season)
-
-        # Add subquery to exclude games that have at-bat details
-        games_with_abs = (
-            select(AtBatDetails.game_mlb_id)
-            .distinct()
-            .where(AtBatDetails.sport_id == sport_id)
-        )
-        if season is not None:
-            games_with_abs = games_with_abs.where(AtBatDetails.season == season)
 
-        # Get games that don't exist in AtBatDetails
-        missing_games = games_query.where(~Game.mlb_id.in_(games_with_abs))
+def get_at_bats_data_for_game(game_id: int, final: bool = False) -> List[Dict]:
+    # call the "game_playByPlay" api with {"gamePk": game_id}, only the
+    # play-by-play of a final game is cached for good
+    game_plays_data = (
+        cached_get("game_playByPlay", {"gamePk": game_id}, permanent=final) or {}
+    )
+    # Compile the at_bats_list by selecting the plays from the "allPlays" list
+    # where play["result"]["type"] == "atBat"
+    return get_at_bat_plays(game_plays_data)
 
-        return [
-            (game_id, game_date)
-            for game_id, game_date in session.execute(missing_games)
-        ]
 
+def fetch_game_at_bats(game_id: int, final: bool = False) -> Tuple[List[Dict], Dict]:
+    """
+    Fetch the at-bats of a game. A failure is not raised but returned along
+    with the fetch latency, to be recorded in the game_fetches ledger.
 
-def get_at_bats_data_for_game(game_id: int) -> List[Dict]:
+    Returns:
+        Tuple[List[Dict], Dict]: The at-bats and {"latency", "error"}
+    """
+    start = time.monotonic()
     try:
-        # call the "game_playByPlay" api with {"gamePk": game_id}
-        game_plays_data = statsapi.get("game_playByPlay", {"gamePk": game_id}) or {}
-        # Extract the "allPlays" list from the api response to plays_list
-        all_plays = game_plays_data.get("allPlays", [])
-        # Compile the at_bats_list by selecting the plays from the plays_list where
-        # play["result"]["type"] == "atBat"
-        at_bats_list = [
-            play for play in all_plays if play.get("result", {}).get("type") == "atBat"
-        ]
-        return at_bats_list
+        at_bats, error = get_at_bats_data_for_game(game_id, final), None
     except Exception as e:
         print(f"Failure for game {game_id}, error: {e}")
-        return []
+        at_bats, error = [], str(e)
+    return at_bats, {"latency": time.monotonic() - start, "error": error}
 
 
-def fetch_game_at_bats(game_id: int) -> List[Dict]:
-    return get_at_bats_data_for_game(game_id)
+def iter_at_bats_with_thread_pool(
+    game_ids: List[int], max_workers: int = 10, final_game_ids: Set[int] = frozenset()
+) -> Iterator[Tuple[int, List[Dict], Dict]]:
+    """
+    Fetch at-bats for the given games over a fixed thread pool, yielding
+    (game_mlb_id, at_bats, fetch) as each fetch completes. The responses of
+    games in final_game_ids are cached for good.
+    """
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        future_to_game = {
+            executor.submit(
+                fetch_game_at_bats, game_mlb_id, game_mlb_id in final_game_ids
+            ): game_mlb_id
+            for game_mlb_id in game_ids
+        }
 
+        for future in concurrent.futures.as_completed(future_to_game):
+            # Drop our reference so the response can be freed once written
+            game_mlb_id = future_to_game.pop(future)
+            try:
+                yield game_mlb_id, *future.result()
+            except Exception as e:
+                print(f"Failed fetching game {game_mlb_id}, error: {e}")
 
-def load_at_bat_details(sport_id: int, season: int = None) -> None:
+
+def load_at_bat_details(
+    sport_id: int,
+    season: int = None,
+    batch_rows: int = 5000,
+    batch_bytes: int = None,
+    async_fetch: bool = False,
+) -> None:
     """
     Load at-bat details for all games that don't have them yet.
 
+    Rows are streamed to the database as fetches complete instead of being held
+    in memory for the whole run. Pending rows are written and committed once
+    batch_rows (or batch_bytes of JSON payload, when given) is reached. A game's
+    at-bats always land in the same commit, so a rerun after a crash only
+    refetches the games that were not committed.
+
     Args:
         sport_id (int): The ID of the sport/league
         season (int, optional): If provided, only process games from this season
+        batch_rows (int): Number of pending rows that triggers a write and commit
+        batch_bytes (int, optional): Approximate size in bytes of pending JSON
+            payloads that triggers a write and commit
+        async_fetch (bool): Fetch play-by-play data with the adaptive asyncio
+            fetcher instead of a fixed pool of 10 threads
     """
     with Session(db_engine) as session:
         # Get games without at-bat details
@@ -91,48 +134,104 @@ def load_at_bat_details(sport_id: int, season: int = None) -> None:
             + (f" in season {season}" if season else "")
         )
 
+        pending = {"rows": [], "bytes": 0, "games": [], "fetches": []}
+        stats = {"rows": 0, "games": 0}
+
+        def flush() -> None:
+            if not pending["fetches"]:
+                return
+            copy_rows(
+                session,
+                AtBatDetails.__table__,
+                AT_BAT_DETAILS_COLUMNS,
+                dict_rows(pending["rows"], AT_BAT_DETAILS_COLUMNS),
+            )
+            mark_games_completed(session, "at_bat_details", sport_id, pending["games"])
+            record_fetches(session, pending["fetches"])
+            session.commit()
+            stats["rows"] += len(pending["rows"])
+            stats["games"] += len(pending["games"])
+            print(
+                f"Committed {len(pending['rows'])} at bats for {len(pending['games'])} games "
+                f"({stats['games']}/{len(games_to_process)} games done)"
+            )
+            pending.update({"rows": [], "bytes": 0, "games": [], "fetches": []})
+
         # Concurrent fetch of at_bats data
-        at_bats_to_save = []
-        with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-            future_to_game = {
-                executor.submit(fetch_game_at_bats, game_mlb_id): (
-                    game_mlb_id,
-                    game_date,
+        games = {
+            game_mlb_id: (game_date, game_season)
+            for game_mlb_id, game_date, game_season, _ in games_to_process
+        }
+        final_game_ids = {
+            game_mlb_id
+            for game_mlb_id, _, _, status in games_to_process
+            if is_final_game_status(status)
+        }
+        # Rows are stored in the partition of their game date's year
+        ensure_season_partitions(
+            game_date.year if game_date else game_season
+            for game_date, game_season in games.values()
+        )
+        if async_fetch:
+            fetched_games = iter_at_bats_for_games(
+                list(games), final_game_ids=final_game_ids
+            )
+        else:
+            fetched_games = iter_at_bats_with_thread_pool(
+                list(games), final_game_ids=final_game_ids
+            )
+
+        for game_mlb_id, game_at_bats, fetch in fetched_games:
+            game_date, game_season = games[game_mlb_id]
+            season = game_date.year if game_date else game_season
+            print(
+                f"Processing {len(game_at_bats)} at-bats for game {game_mlb_id} in season {season}"
+            )
+
+            game_rows = [
+                {
+                    "game_mlb_id": game_mlb_id,
+                    "sport_id": sport_id,
+                    "season": season,
+                    "details": ab,
+                }
+                for ab in game_at_bats
+            ]
+            valid_rows, errors = validate_batch(AtBatDetailsSchema, game_rows)
+            for i, error in errors:
+                print(
+                    f"Failed validation for AB {i} in game {game_mlb_id}, error: {error}"
                 )
-                for game_mlb_id, game_date in games_to_process
-            }
-
-            for future in concurrent.futures.as_completed(future_to_game):
-                game_mlb_id, game_date = future_to_game[future]
-                try:
-                    game_at_bats = future.result()
-                    season = game_date.year if game_date else None
-                    print(
-                        f"Processing {len(game_at_bats)} at-bats for game {game_mlb_id} in season {season}"
-                    )
-
-                    for ab in game_at_bats:
-                        ab_data = AtBatDetails(
-                            game_mlb_id=game_mlb_id,
-                            sport_id=sport_id,
-                            season=season,
-                            details=ab,
-                        )
-                        try:
-                            AtBatDetailsSchema.from_orm(ab_data)
-                            at_bats_to_save.append(ab_data)
-                        except Exception as e:
-                            print(
-                                f"Failed validation for AB in game {game_mlb_id}, error: {e}"
-                            )
-                except Exception as e:
-                    print(f"Failed fetching game {game_mlb_id}, error: {e}")
-
-        print(f"Writing {len(at_bats_to_save)} at bats")
-        session.bulk_save_objects(at_bats_to_save)
-        session.commit()
+
+            payload_bytes = 0
+            for row in valid_rows:
+                # Serialize once here; the COPY writer passes strings through
+                row["details"] = json.dumps(row["details"])
+                payload_bytes += len(row["details"])
+                pending["rows"].append(row)
+            pending["bytes"] += payload_bytes
+            pending["fetches"].append(
+                {
+                    "game_mlb_id": game_mlb_id,
+                    "sport_id": sport_id,
+                    "season": game_season,
+                    "at_bat_count": len(game_at_bats),
+                    "payload_bytes": payload_bytes,
+                    **fetch,
+                }
+            )
+            # Games without plays (e.g. not played yet) stay pending
+            if game_at_bats:
+                pending["games"].append((game_mlb_id, game_season))
+
+            if len(pending["rows"]) >= batch_rows or (
+                batch_bytes and pending["bytes"] >= batch_bytes
+            ):
+                flush()
+
+        flush()
         print(
-            f"Processed all games in {(datetime.now() - start_time).total_seconds() / 60:.2f} minutes"
+            f"Wrote {stats['rows']} at bats for {stats['games']} games in {(datetime.now() - start_time).total_seconds() / 60:.2f} minutes"
         )
 
 
@@ -144,10 +243,32 @@ if __name__ == "__main__":
         type=int,
         help="Season to process. If not provided, processes all seasons.",
     )
+    parser.add_argument(
+        "--batch-rows",
+        type=int,
+        default=5000,
+        help="Write and commit once this many at-bat rows are pending.",
+    )
+    parser.add_argument(
+        "--batch-bytes",
+        type=int,
+        help="Write and commit once pending JSON payloads reach this many bytes.",
+    )
+    parser.add_argument(
+        "--async-fetch",
+        action="store_true",
+        help="Use the asyncio fetcher with adaptive concurrency.",
+    )
     args = parser.parse_args()
 
     print(
         f"Loading at-bat details for sport {args.sport_id}"
         + (f" for season {args.season}" if args.season else "")
     )
-    load_at_bat_details(args.sport_id, args.season)
+    load_at_bat_details(
+        args.sport_id,
+        args.season,
+        args.batch_rows,
+        args.batch_bytes,
+        args.async_fetch,
+    )
@@ -1,159 +1,261 @@
 import argparse
+import json
+from collections import deque
 from datetime import datetime
-from typing import Dict, List, Tuple
-from pydantic import ValidationError
+from itertools import groupby
+from typing import Dict, Iterator, List, Optional, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy import Text, cast, select
 
 from app.schemas import AtBatSchema
+from app.scripts.bulk_write import (
+    copy_encoded,
+    dict_rows,
+    encode_rows,
+    get_encoders,
+    get_insert_columns,
+)
+from app.scripts.id_resolver import get_resolver
+from app.scripts.ingestion_state import get_pending_games_filter, mark_games_completed
+from app.scripts.parallel import map_in_processes
+from app.validation import validate_batch
 
 from . import db_engine
 from app.models import AtBat, AtBatDetails, Game, Player
 
+AT_BAT_COLUMNS = get_insert_columns(AtBat.__table__)
+AT_BAT_ENCODERS = get_encoders(AtBat.__table__, AT_BAT_COLUMNS)
 
-def get_games_without_at_bats(
-    sport_id: int, season: int = None
-) -> List[Tuple[int, int, datetime.date]]:
+
+def get_at_bat_details_without_at_bats_query(sport_id: int, season: int = None):
     """
-    Get a list of games that have no AtBat records.
+    Build a query for the AtBatDetails of every game not done yet for the
+    at_bats stage.
+
+    Rows come out as (game_mlb_id, game_id, season, at_bat_details_id,
+    at_bat_details_season, details) ordered by game, so they can be streamed and grouped one game at a time.
+    The details are returned as JSON text and decoded by whichever process
+    builds the rows.
 
     Args:
         sport_id (int): The ID of the sport/league
         season (int, optional): If provided, only check games from this season
+    """
+    return (
+        select(
+            AtBatDetails.game_mlb_id,
+            Game.id,
+            Game.season,
+            AtBatDetails.id,
+            AtBatDetails.season,
+            cast(AtBatDetails.details, Text),
+        )
+        .join(Game, Game.mlb_id == AtBatDetails.game_mlb_id)
+        .where(
+            AtBatDetails.sport_id == sport_id,
+            get_pending_games_filter("at_bats", sport_id, season),
+        )
+        .order_by(AtBatDetails.game_mlb_id, AtBatDetails.id)
+    )
+
+
+def build_at_bat_row(
+    details: Dict,
+    at_bat_details_id: int,
+    season: int,
+    sport_id: int,
+    game_id: int,
+    game_mlb_id: int,
+    player_id_mappings: Dict[int, int],
+) -> Optional[Dict]:
+    """
+    Build an at_bats row from a play in the "game_playByPlay" response. The
+    play itself is not copied into the row, which points at the AtBatDetails
+    holding it. season must be the AtBatDetails' season, since the at-bat is
+    stored in the partition of the same season.
 
     Returns:
-        List[Tuple[int, int, datetime.date]]: List of tuples containing (game_mlb_id, game_id, game_date)
-        for games that need AtBat records
+        Optional[Dict]: The row keyed by column name, or None if the play has no pitches
     """
-    with Session(db_engine) as session:
-        # Get all games that don't have AtBat records
-        games_query = select(Game.mlb_id, Game.id, Game.game_date).where(
-            Game.sport_id == sport_id,
-            ~Game.mlb_id.in_(
-                select(AtBat.game_mlb_id).distinct().where(AtBat.sport_id == sport_id)
-            ),
-        )
+    pitches = [event for event in details["playEvents"] if event.get("type") == "pitch"]
+    if not pitches:
+        return None
+    last_pitch = pitches[-1]
+    end_count = last_pitch.get("count", {})
+    runners = details.get("runners", [])
+    runner_positions = {
+        "1B": False,
+        "2B": False,
+        "3B": False,
+    }
+    for runner in runners:
+        if runner.get("movement", {}).get("start") == "1B":
+            runner_positions["1B"] = True
+        if runner.get("movement", {}).get("start") == "2B":
+            runner_positions["2B"] = True
+        if runner.get("movement", {}).get("start") == "3B":
+            runner_positions["3B"] = True
 
-        # Add season filter if provided
-        if season is not None:
-            games_query = games_query.where(Game.season == season)
+    pitcher_mlb_id = details.get("matchup", {}).get("pitcher", {}).get("id")
+    batter_mlb_id = details.get("matchup", {}).get("batter", {}).get("id")
 
-        return [
-            (mlb_id, id, game_date)
-            for mlb_id, id, game_date in session.execute(games_query)
-        ]
+    return {
+        "season": season,
+        "sport_id": sport_id,
+        "at_bat_index": details.get("about", {}).get("atBatIndex"),
+        "has_out": details.get("about", {}).get("hasOut"),
+        "outs": end_count.get("outs"),
+        "balls": end_count.get("balls"),
+        "strikes": end_count.get("strikes"),
+        "total_pitch_count": len(pitches),
+        "inning": details.get("about", {}).get("inning"),
+        "is_top_inning": details.get("about", {}).get("isTopInning"),
+        "rbi": details.get("result", {}).get("rbi"),
+        "event_type": details.get("result", {}).get("eventType"),
+        "is_scoring_play": details.get("about", {}).get("isScoringPlay"),
+        "r1b": runner_positions["1B"],
+        "r2b": runner_positions["2B"],
+        "r3b": runner_positions["3B"],
+        "at_bat_details_id": at_bat_details_id,
+        "game_id": game_id,
+        "game_mlb_id": game_mlb_id,
+        "pitcher_mlb_id": pitcher_mlb_id,
+        "pitcher_id": player_id_mappings.get(pitcher_mlb_id),
+        "batter_mlb_id": batter_mlb_id,
+        "batter_id": player_id_mappings.get(batter_mlb_id),
+    }
 
 
-def get_player_id_mappings() -> Dict[int, int]:
-    # Fetch all players for given league and season
-    with Session(db_engine) as session:
-        players = session.query(Player).all()
-        # Return a dictionary of mlb_id: id
-        return {player.mlb_id: player.id for player in players}
+def build_game_at_bats(
+    game: Tuple[int, int, List[Tuple[int, int, str]]],
+    sport_id: int,
+    player_id_mappings: Dict[int, int],
+) -> Tuple[bytes, int, List[Tuple[int, str]]]:
+    """
+    Build, validate and encode the at_bats rows for one game.
+
+    This is the whole CPU-bound part of load_at_bats. It takes and returns only
+    text and bytes so it is cheap to run in a worker process.
+
+    Args:
+        game: (game_mlb_id, game_id, [(at_bat_details_id, season, details
+            JSON), ...])
+
+    Returns:
+        Tuple[bytes, int, List[Tuple[int, str]]]: The rows encoded for
+        copy_encoded, the number of rows, and (at_bat_details_id, error) for
+        every play that failed validation
+    """
+    game_mlb_id, game_id, game_at_bat_details = game
+    at_bats = []
+    at_bat_details_ids = []
+    for at_bat_details_id, season, details in game_at_bat_details:
+        at_bat = build_at_bat_row(
+            json.loads(details),
+            at_bat_details_id,
+            season,
+            sport_id,
+            game_id,
+            game_mlb_id,
+            player_id_mappings,
+        )
+        if at_bat is not None:
+            at_bats.append(at_bat)
+            at_bat_details_ids.append(at_bat_details_id)
+
+    at_bats, errors = validate_batch(AtBatSchema, at_bats)
+    encoded = encode_rows(dict_rows(at_bats, AT_BAT_COLUMNS), AT_BAT_ENCODERS)
+    return (
+        encoded,
+        len(at_bats),
+        [(at_bat_details_ids[i], error) for i, error in errors],
+    )
 
 
-def load_at_bats(sport_id: int, season: int = None) -> None:
+def load_at_bats(
+    sport_id: int, season: int = None, batch_rows: int = 5000, workers: int = 1
+) -> None:
     """
-    Load AtBat records for all games that have AtBatDetails but no AtBat records.
+    Load AtBat records for all games that have AtBatDetails but are not done
+    yet for the at_bats stage.
+
+    The AtBatDetails are read through a single server-side cursor, fetched
+    batch_rows at a time and processed game by game as they stream in. AtBats
+    are written and committed once at least batch_rows are pending, always at a
+    game boundary, on a separate session so the cursor stays open.
+
+    With more than one worker, games are decoded, validated and encoded on a
+    process pool while this process only reads and writes. The rows and their
+    order are the same as with a single worker.
 
     Args:
         sport_id (int): The ID of the sport/league
         season (int, optional): If provided, only process games from this season
+        batch_rows (int): Rows fetched per round-trip, and pending AtBats that
+            trigger a write and commit
+        workers (int): Number of processes building rows from the AtBatDetails
     """
-    player_id_mappings = get_player_id_mappings()
-    with Session(db_engine) as session:
-        start_time = datetime.now()
-        at_bats = []
+    player_id_mappings = get_resolver(Player)
+    start_time = datetime.now()
+    print(
+        "Processing games that have AtBatDetails but no AtBat records"
+        + (f" for season {season}" if season else "")
+    )
 
-        # Get games that need processing
-        games_to_process = get_games_without_at_bats(sport_id, season)
-        print(
-            f"Processing {len(games_to_process)} games that have AtBatDetails but no AtBat records"
-            + (f" for season {season}" if season else "")
-        )
+    with Session(db_engine) as read_session, Session(db_engine) as write_session:
+        pending = {"blocks": [], "rows": 0, "games": []}
+        games_count = 0
+        stored_count = 0
 
-        # Process each game
-        for game_mlb_id, game_id, game_date in games_to_process:
-            game_at_bat_details = (
-                session.query(AtBatDetails)
-                .filter(
-                    AtBatDetails.game_mlb_id == game_mlb_id,
-                    AtBatDetails.sport_id == sport_id,
-                )
-                .all()
+        def flush() -> None:
+            copy_encoded(
+                write_session, AtBat.__table__, AT_BAT_COLUMNS, pending["blocks"]
             )
+            mark_games_completed(write_session, "at_bats", sport_id, pending["games"])
+            write_session.commit()
+            pending["blocks"] = []
+            pending["rows"] = 0
+            pending["games"] = []
+
+        rows = read_session.execute(
+            get_at_bat_details_without_at_bats_query(
+                sport_id, season
+            ).execution_options(stream_results=True, yield_per=batch_rows)
+        )
+        # Results come back in input order, so the keys can be matched up again
+        game_keys = deque()
+
+        def iter_games() -> Iterator[Tuple[int, int, List[Tuple[int, int, str]]]]:
+            for (game_mlb_id, game_id, game_season), game_rows in groupby(
+                rows, key=lambda row: (row[0], row[1], row[2])
+            ):
+                game_keys.append((game_mlb_id, game_season))
+                yield game_mlb_id, game_id, [row[3:] for row in game_rows]
+
+        for encoded, row_count, errors in map_in_processes(
+            build_game_at_bats,
+            iter_games(),
+            workers,
+            sport_id=sport_id,
+            player_id_mappings=player_id_mappings,
+        ):
+            games_count += 1
+            for at_bat_details_id, error in errors:
+                print(f"Error validating AtBat from AtBatDetails {at_bat_details_id}")
+                print(error)
+
+            pending["blocks"].append(encoded)
+            pending["rows"] += row_count
+            pending["games"].append(game_keys.popleft())
+            stored_count += row_count
+            if pending["rows"] >= batch_rows:
+                flush()
+
+        if pending["games"]:
+            flush()
 
-            for ab_details in game_at_bat_details:
-                details = ab_details.details
-                pitches = [
-                    event
-                    for event in details["playEvents"]
-                    if event.get("type") == "pitch"
-                ]
-                if not pitches:
-                    continue
-                last_pitch = pitches[-1]
-                end_count = last_pitch.get("count", {})
-                runners = details.get("runners", [])
-                runner_positions = {
-                    "1B": False,
-                    "2B": False,
-                    "3B": False,
-                }
-                for runner in runners:
-                    if runner.get("movement", {}).get("start") == "1B":
-                        runner_positions["1B"] = True
-                    if runner.get("movement", {}).get("start") == "2B":
-                        runner_positions["2B"] = True
-                    if runner.get("movement", {}).get("start") == "3B":
-                        runner_positions["3B"] = True
-
-                at_bat = AtBat(
-                    sport_id=sport_id,
-                    at_bat_index=details.get("about", {}).get("atBatIndex"),
-                    has_out=details.get("about", {}).get("hasOut"),
-                    outs=end_count.get("outs"),
-                    balls=end_count.get("balls"),
-                    strikes=end_count.get("strikes"),
-                    total_pitch_count=len(pitches),
-                    inning=details.get("about", {}).get("inning"),
-                    is_top_inning=details.get("about", {}).get("isTopInning"),
-                    result=details.get("result"),
-                    rbi=details.get("result", {}).get("rbi"),
-                    event_type=details.get("result", {}).get("eventType"),
-                    is_scoring_play=details.get("about", {}).get("isScoringPlay"),
-                    r1b=runner_positions["1B"],
-                    r2b=runner_positions["2B"],
-                    r3b=runner_positions["3B"],
-                    details=details,
-                    game_id=game_id,  # Using the game_id we already have
-                    game_mlb_id=game_mlb_id,
-                    pitcher_mlb_id=details.get("matchup", {})
-                    .get("pitcher", {})
-                    .get("id"),
-                    pitcher_id=player_id_mappings.get(
-                        details.get("matchup", {}).get("pitcher", {}).get("id")
-                    ),
-                    batter_mlb_id=details.get("matchup", {})
-                    .get("batter", {})
-                    .get("id"),
-                    batter_id=player_id_mappings.get(
-                        details.get("matchup", {}).get("batter", {}).get("id")
-                    ),
-                )
-
-                try:
-                    AtBatSchema.from_orm(at_bat)
-                    at_bats.append(at_bat)
-                except ValidationError as e:
-                    print(f"Error validating AtBat from AtBatDetails {ab_details.id}")
-                    print(e)
-
-        # Save all at bats in one batch
-        session.bulk_save_objects(at_bats)
-        session.commit()
         print(
-            f"Stored {len(at_bats)} AtBats in {(datetime.now() - start_time).total_seconds() / 60:.2f} minutes"
+            f"Stored {stored_count} AtBats for {games_count} games in {(datetime.now() - start_time).total_seconds() / 60:.2f} minutes"
         )
 
 
@@ -165,10 +267,22 @@ if __name__ == "__main__":
         type=int,
         help="Season to process. If not provided, processes all seasons.",
     )
+    parser.add_argument(
+        "--batch-rows",
+        type=int,
+        default=5000,
+        help="Rows fetched per round-trip and AtBats written per commit",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes building AtBat rows",
+    )
     args = parser.parse_args()
 
     print(
         f"Loading at-bats for sport {args.sport_id}"
         + (f" for season {args.season}" if args.season else "")
     )
-    load_at_bats(args.sport_id, args.season)
+    load_at_bats(args.sport_id, args.season, args.batch_rows, args.workers)
@@ -1,11 +1,18 @@
 import argparse
+import concurrent.futures
+from collections import deque
 from datetime import date, datetime, timedelta
 from functools import lru_cache
+from itertools import islice
 
 import statsapi
 from sqlalchemy import func
 from app.models import Game, Team
 from app.schemas import GameSchema
+from app.scripts.bulk_write import upsert_rows
+from app.scripts.constants import SCHEDULE_FETCH_WORKERS, SCHEDULE_WINDOW_DAYS
+from app.scripts.statsapi_cache import cached_call
+from app.validation import validate_batch
 from sqlalchemy.orm import Session
 
 
@@ -25,19 +32,22 @@ def get_max_game_date():
 def get_team_ids(sport_id):
     print(f"Retrieving team IDs for sport {sport_id}")
     with Session(db_engine) as session:
-        teams = (
-            session.query(Team)
-            .filter(Team.sport_id == sport_id)
-            .order_by(Team.mlb_id)
-            .all()
-        )
-        return [team.mlb_id for team in teams]
+        teams = session.query(Team.mlb_id).filter(Team.sport_id == sport_id).all()
+        return frozenset(team.mlb_id for team in teams)
 
 
-def get_existing_games_map() -> dict:
-    with Session(db_engine) as session:
-        games = session.query(Game).all()
-        return {game.mlb_id: game for game in games}
+def get_date_windows(start_date, end_date, window_days=SCHEDULE_WINDOW_DAYS):
+    """
+    Split the inclusive range start_date..end_date into consecutive inclusive
+    (start, end) windows of at most window_days days.
+    """
+    windows = []
+    window_start = start_date
+    while window_start <= end_date:
+        window_end = min(window_start + timedelta(days=window_days - 1), end_date)
+        windows.append((window_start, window_end))
+        window_start = window_end + timedelta(days=1)
+    return windows
 
 
 def get_games_data_for_date_range(sport_id, start_date, end_date):
@@ -46,8 +56,13 @@ def get_games_data_for_date_range(sport_id, start_date, end_date):
     end_date_str = end_date.strftime("%m/%d/%Y")
 
     # Call the schedule function with sportId and date range
-    games = statsapi.schedule(
-        sportId=sport_id, start_date=start_date_str, end_date=end_date_str
+    schedule_params = {
+        "sportId": sport_id,
+        "start_date": start_date_str,
+        "end_date": end_date_str,
+    }
+    games = cached_call(
+        "schedule", schedule_params, lambda: statsapi.schedule(**schedule_params)
     )
     games_map = {}
     team_ids = get_team_ids(sport_id)
@@ -67,69 +82,104 @@ def get_games_data_for_date_range(sport_id, start_date, end_date):
     return games_map
 
 
-def load_games(sport_id, start_date, end_date):
-    # Get games data and existing games
-    games_data = get_games_data_for_date_range(sport_id, start_date, end_date)
-    existing_games = get_existing_games_map()
-
+def iter_games_data(
+    sport_id,
+    start_date,
+    end_date,
+    window_days=SCHEDULE_WINDOW_DAYS,
+    max_workers=SCHEDULE_FETCH_WORKERS,
+):
+    """
+    Fetch the schedule window by window over a thread pool, yielding each
+    window's games map in date order. At most max_workers windows are fetched
+    or waiting to be consumed at once, so a multi-year range is never held in
+    memory as a whole.
+
+    Args:
+        sport_id (int): The ID of the sport/league
+        start_date (date): First day to fetch
+        end_date (date): Last day to fetch (inclusive)
+        window_days (int): Days per schedule request
+        max_workers (int): Windows to fetch at once
+
+    Yields:
+        Dict[int, Dict]: game_id -> schedule entry for each window
+    """
+    windows = iter(get_date_windows(start_date, end_date, window_days))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque(
+            executor.submit(get_games_data_for_date_range, sport_id, *window)
+            for window in islice(windows, max_workers)
+        )
+        while pending:
+            games_map = pending.popleft().result()
+            for window in islice(windows, 1):
+                pending.append(
+                    executor.submit(get_games_data_for_date_range, sport_id, *window)
+                )
+            yield games_map
+
+
+def build_game_row(game_data: dict, sport_id: int) -> dict:
+    game_date = (
+        datetime.strptime(game_data["game_date"], "%Y-%m-%d").date()
+        if game_data.get("game_date")
+        else None
+    )
+    return {
+        "mlb_id": game_data.get("game_id"),
+        "sport_id": sport_id,
+        "game_date": game_date,
+        "game_type": game_data.get("game_type"),
+        "season": game_date.year if game_date else None,
+        "details": game_data,
+        "home_team_mlb_id": game_data.get("home_id"),
+        "away_team_mlb_id": game_data.get("away_id"),
+    }
+
+
+def load_games(
+    sport_id,
+    start_date,
+    end_date,
+    window_days=SCHEDULE_WINDOW_DAYS,
+    max_workers=SCHEDULE_FETCH_WORKERS,
+):
     stats = {"updated": 0, "inserted": 0, "failed": 0}
 
-    # With an open sqlalchemy Session:
     with Session(db_engine) as session:
-        # Disable autoflush during the entire operation
-        with session.no_autoflush:
-            # For every game in the games data:
+        # Upsert each schedule window as soon as it is fetched
+        for games_data in iter_games_data(
+            sport_id, start_date, end_date, window_days, max_workers
+        ):
+            game_rows = []
             for game_data in games_data.values():
                 # Ignore All-Stars and unofficial games
                 if game_data.get("game_type") in ["A", "E"]:
                     continue
 
                 try:
-                    game_mlb_id = game_data.get("game_id")
-                    game_id = None
-                    if game_mlb_id in existing_games:
-                        game_id = existing_games[game_mlb_id].id
-                        stats["updated"] += 1
-                    else:
-                        stats["inserted"] += 1
-
-                    game_date = (
-                        datetime.strptime(game_data["game_date"], "%Y-%m-%d").date()
-                        if game_data.get("game_date")
-                        else None
-                    )
-
-                    # Instantiate a Game object
-                    game_instance = Game(
-                        id=game_id,
-                        mlb_id=game_mlb_id,
-                        sport_id=sport_id,
-                        game_date=game_date,
-                        game_type=game_data.get("game_type"),
-                        season=game_date.year if game_date else None,
-                        details=game_data,
-                        home_team_mlb_id=game_data.get("home_id"),
-                        away_team_mlb_id=game_data.get("away_id"),
-                    )
-
-                    # Validate the game data
-                    GameSchema.from_orm(game_instance)
-
-                    # Merge will handle both insert and update
-                    session.merge(game_instance)
-
+                    game_rows.append(build_game_row(game_data, sport_id))
                 except Exception as e:
                     stats["failed"] += 1
                     print(
                         f"Failed validation for game with mlb_id {game_data.get('game_id')}, error: {e}"
                     )
-                    session.rollback()
 
-            # Flush all changes at once
-            session.flush()
+            # Validate all the games of the window at once
+            games, errors = validate_batch(GameSchema, game_rows)
+            for i, error in errors:
+                stats["failed"] += 1
+                print(
+                    f"Failed validation for game with mlb_id {game_rows[i]['mlb_id']}, error: {error}"
+                )
+
+            # Insert new games and update existing ones in a few set-based statements
+            window_stats = upsert_rows(session, Game.__table__, games)
+            session.commit()
+            stats["updated"] += window_stats["updated"]
+            stats["inserted"] += window_stats["inserted"]
 
-        # Commit all changes
-        session.commit()
         print("Sync complete:")
         print(f"- Updated: {stats['updated']} games")
         print(f"- Inserted: {stats['inserted']} new games")
@@ -149,6 +199,12 @@ if __name__ == "__main__":
         type=str,
         help="End date (YYYY-MM-DD). If not provided, uses today's date.",
     )
+    parser.add_argument(
+        "--window-days",
+        type=int,
+        default=SCHEDULE_WINDOW_DAYS,
+        help="Days of schedule to request at once",
+    )
     args = parser.parse_args()
 
     # Get the end date (today if not specified)
@@ -182,4 +238,4 @@ if __name__ == "__main__":
 
     print(f"Loading games for {args.sport_id} from {start_date} to {end_date}")
 
-    load_games(args.sport_id, start_date, end_date)
+    load_games(args.sport_id, start_date, end_date, args.window_days)
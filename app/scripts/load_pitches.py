@@ -1,116 +1,273 @@
 import argparse
+import json
+from collections import deque
 from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
 
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy import Text, cast, select, tuple_
 from app.schemas import PitchSchema
 from app.scripts import db_engine
+from app.scripts.bulk_write import (
+    copy_encoded,
+    dict_rows,
+    encode_rows,
+    get_encoders,
+    get_insert_columns,
+)
+from app.scripts.constants import PITCH_DATA_FIELDS
+from app.scripts.ingestion_state import get_pending_games_filter, mark_games_completed
+from app.scripts.parallel import map_in_processes
+from app.validation import validate_batch
 
-from app.models import AtBat, Game, Pitch
+from app.models import AtBat, AtBatDetails, Game, Pitch
 
+PITCH_COLUMNS = get_insert_columns(Pitch.__table__)
+PITCH_ENCODERS = get_encoders(Pitch.__table__, PITCH_COLUMNS)
 
-def get_at_bats_without_pitches(sport_id: int, season: int = None) -> list[AtBat]:
+
+def get_at_bats_without_pitches(
+    sport_id: int, season: int = None, batch_size: int = 5000
+) -> Iterator[List[Tuple[int, int, int, int, str]]]:
     """
-    Get all AtBats that don't have any associated Pitch records.
+    Get the AtBats of every game not done yet for the pitches stage, in batches.
+
+    Pending games are an indexed lookup in ingestion_state. Pages are read with
+    keyset pagination on (game_mlb_id, at_bats.id), each in its own short
+    transaction, so every batch costs one index range scan no matter how far
+    into the table it is. Only the columns the pitch transform needs are
+    fetched.
 
     Args:
         sport_id (int): The ID of the sport/league
         season (int, optional): If provided, only check at-bats from this season
+        batch_size (int): Number of AtBats per batch
 
-    Returns:
-        list[AtBat]: List of AtBat records that need Pitch records
+    Yields:
+        List[Tuple[int, int, int, int, str]]: (game_mlb_id, season, at_bat_id,
+        at_bat_season, playEvents JSON) for the AtBats that need Pitch
+        records, ordered by game and at_bat_id
     """
-    with Session(db_engine) as session:
-        query = (
-            session.query(AtBat)
-            .join(Game, AtBat.game_id == Game.id)
-            .filter(
-                AtBat.sport_id == sport_id,
-                ~AtBat.id.in_(select(Pitch.at_bat_id).distinct()),
-            )
+    query = (
+        select(
+            AtBat.game_mlb_id,
+            Game.season,
+            AtBat.id,
+            AtBat.season,
+            cast(AtBatDetails.details["playEvents"], Text),
+        )
+        .join(Game, AtBat.game_mlb_id == Game.mlb_id)
+        .join(
+            AtBatDetails,
+            (AtBatDetails.id == AtBat.at_bat_details_id)
+            & (AtBatDetails.season == AtBat.season),
         )
+        .where(
+            AtBat.sport_id == sport_id,
+            get_pending_games_filter("pitches", sport_id, season),
+        )
+        .order_by(AtBat.game_mlb_id, AtBat.id)
+        .limit(batch_size)
+    )
 
-        # Add season filter if provided
-        if season is not None:
-            query = query.filter(Game.season == season)
+    last_key = (0, 0)
+    while True:
+        with Session(db_engine) as session:
+            batch = session.execute(
+                query.where(tuple_(AtBat.game_mlb_id, AtBat.id) > last_key)
+            ).all()
+        if not batch:
+            return
+        yield batch
+        last_key = (batch[-1][0], batch[-1][2])
 
-        return query.all()
 
+def get_pitch_data_values(pitch_data: Dict) -> Dict:
+    """
+    Get the value of every PITCH_DATA_FIELDS column from a pitch event's
+    "pitchData", None where the API left the field out.
+    """
+    values = {}
+    for column, path in PITCH_DATA_FIELDS.items():
+        value = pitch_data
+        for key in path:
+            value = value.get(key) if isinstance(value, dict) else None
+        values[column] = value
+    return values
 
-def load_pitches(sport_id: int, season: int = None) -> None:
+
+def build_pitch_rows(
+    at_bat_id: int, season: int, play_events: List[Dict]
+) -> List[Dict]:
     """
-    Load Pitch records for all AtBats that don't have any Pitch records.
+    Build the pitches rows for an at-bat from its "playEvents".
+    The count a pitch was thrown in is tracked from the end count of the
+    previous event, including non-pitch events such as pickoffs. The events
+    are not copied into the rows: pitch_index is the event's position in
+    "playEvents", which Pitch.details reads from the AtBatDetails. season is
+    the at-bat's season, whose partition the pitches are stored in.
 
-    Args:
-        sport_id (int): The ID of the sport/league
-        season (int, optional): If provided, only process at-bats from this season
+    Returns:
+        List[Dict]: The rows keyed by column name
     """
-    with Session(db_engine) as session:
-        start_time = datetime.now()
+    pitches = []
+    starting_count = {"balls": 0, "strikes": 0}
 
-        # Get AtBats that need processing
-        at_bats = get_at_bats_without_pitches(sport_id, season)
-        print(
-            f"Processing {len(at_bats)} AtBats that have no Pitch records"
-            + (f" for season {season}" if season else "")
-        )
+    for i, event in enumerate(play_events):
+        is_pitch = event.get("type") == "pitch"
+        end_count = event.get("count", {})
 
-        pitches_to_persist = []
-        for at_bat in at_bats:
-            starting_count = {"balls": 0, "strikes": 0}
-            play_events = at_bat.details.get("playEvents", [])
-
-            for i, event in enumerate(play_events):
-                is_pitch = event.get("type") == "pitch"
-                end_count = event.get("count", {})
-
-                if not is_pitch:
-                    starting_count = {
-                        "balls": end_count.get("balls"),
-                        "strikes": end_count.get("strikes"),
-                    }
-                    continue
-
-                pitch = Pitch(
-                    pitch_index=i,
-                    ball_count=starting_count["balls"],
-                    strike_count=starting_count["strikes"],
-                    pitch_type_code=event.get("details", {})
+        if is_pitch:
+            pitches.append(
+                {
+                    "pitch_index": i,
+                    "ball_count": starting_count["balls"],
+                    "strike_count": starting_count["strikes"],
+                    "pitch_type_code": event.get("details", {})
                     .get("type", {})
                     .get("code"),
-                    pitch_type_description=event.get("details", {})
+                    "pitch_type_description": event.get("details", {})
                     .get("type", {})
                     .get("description"),
-                    call_code=event.get("details", {}).get("call", {}).get("code"),
-                    call_description=event.get("details", {})
+                    "call_code": event.get("details", {}).get("call", {}).get("code"),
+                    "call_description": event.get("details", {})
                     .get("call", {})
                     .get("description"),
-                    zone=event.get("pitchData", {}).get("zone"),
-                    start_speed=event.get("pitchData", {}).get("startSpeed"),
-                    is_ball=event.get("details", {}).get("isBall"),
-                    is_strike=event.get("details", {}).get("isStrike"),
-                    is_foul=event.get("details", {}).get("call") == "F",
-                    is_out=event.get("details", {}).get("isOut"),
-                    is_in_play=event.get("details", {}).get("isInPlay"),
-                    details=event,
-                    at_bat_id=at_bat.id,
-                )
-                try:
-                    PitchSchema.from_orm(pitch)
-                    pitches_to_persist.append(pitch)
-                except Exception as e:
-                    print(f"Error validating pitch: {e}")
-                finally:
-                    starting_count = {
-                        "balls": end_count.get("balls"),
-                        "strikes": end_count.get("strikes"),
-                    }
-
-        print(f"Storing {len(pitches_to_persist)} Pitches")
-        session.bulk_save_objects(pitches_to_persist)
-        session.commit()
+                    "zone": event.get("pitchData", {}).get("zone"),
+                    "start_speed": event.get("pitchData", {}).get("startSpeed"),
+                    "is_ball": event.get("details", {}).get("isBall"),
+                    "is_strike": event.get("details", {}).get("isStrike"),
+                    "is_foul": event.get("details", {}).get("call") == "F",
+                    "is_out": event.get("details", {}).get("isOut"),
+                    "is_in_play": event.get("details", {}).get("isInPlay"),
+                    **get_pitch_data_values(event.get("pitchData", {})),
+                    "at_bat_id": at_bat_id,
+                    "season": season,
+                }
+            )
+
+        starting_count = {
+            "balls": end_count.get("balls"),
+            "strikes": end_count.get("strikes"),
+        }
+
+    return pitches
+
+
+def build_game_pitches(
+    game_at_bats: List[Tuple[int, int, Optional[str]]],
+) -> Tuple[bytes, int, List[str]]:
+    """
+    Build, validate and encode the pitches rows for every at-bat of one game.
+
+    This is the whole CPU-bound part of load_pitches. It takes and returns only
+    text and bytes so it is cheap to run in a worker process.
+
+    Args:
+        game_at_bats: [(at_bat_id, season, playEvents JSON), ...] for the game
+
+    Returns:
+        Tuple[bytes, int, List[str]]: The rows encoded for copy_encoded, the
+        number of rows, and an error message for every pitch that failed validation
+    """
+    pitches = []
+    for at_bat_id, season, play_events in game_at_bats:
+        pitches.extend(
+            build_pitch_rows(at_bat_id, season, json.loads(play_events or "[]"))
+        )
+
+    pitches_to_persist, errors = validate_batch(PitchSchema, pitches)
+    encoded = encode_rows(dict_rows(pitches_to_persist, PITCH_COLUMNS), PITCH_ENCODERS)
+    return (
+        encoded,
+        len(pitches_to_persist),
+        [
+            f"Error validating pitch {pitches[i]['pitch_index']} of AtBat {pitches[i]['at_bat_id']}: {error}"
+            for i, error in errors
+        ],
+    )
+
+
+def load_pitches(
+    sport_id: int, season: int = None, workers: int = 1, batch_rows: int = 5000
+) -> None:
+    """
+    Load Pitch records for the AtBats of every game not done yet for the
+    pitches stage.
+
+    AtBats are read batch_rows at a time and their pitches are written and
+    committed once at least batch_rows are pending, always at a game boundary
+    and together with the games' ingestion state, so memory stays bounded and
+    a rerun picks up where an interrupted run stopped.
+
+    The at-bats are sharded by game. With more than one worker, each game's
+    rows are decoded, validated and encoded on a process pool and written from
+    this process, in the same order as with a single worker.
+
+    Args:
+        sport_id (int): The ID of the sport/league
+        season (int, optional): If provided, only process at-bats from this season
+        workers (int): Number of processes building rows from the playEvents
+        batch_rows (int): AtBats fetched per batch, and pending Pitches that
+            trigger a write and commit
+    """
+    start_time = datetime.now()
+    print(
+        "Processing AtBats of games that have no Pitch records"
+        + (f" for season {season}" if season else "")
+    )
+
+    with Session(db_engine) as session:
+        pending = {"blocks": [], "rows": 0, "games": []}
+        at_bats_count = 0
+        pitches_count = 0
+
+        def flush() -> None:
+            copy_encoded(session, Pitch.__table__, PITCH_COLUMNS, pending["blocks"])
+            mark_games_completed(session, "pitches", sport_id, pending["games"])
+            session.commit()
+            pending["blocks"] = []
+            pending["rows"] = 0
+            pending["games"] = []
+
+        # Results come back in input order, so the keys can be matched up again
+        game_keys = deque()
+
+        def iter_games() -> Iterator[List[Tuple[int, int, str]]]:
+            nonlocal at_bats_count
+            # A game can span two batches, so it is only yielded once complete
+            game_key, game_at_bats = None, []
+            for batch in get_at_bats_without_pitches(sport_id, season, batch_rows):
+                at_bats_count += len(batch)
+                for game_mlb_id, game_season, *at_bat in batch:
+                    if (game_mlb_id, game_season) != game_key:
+                        if game_at_bats:
+                            game_keys.append(game_key)
+                            yield game_at_bats
+                        game_key, game_at_bats = (game_mlb_id, game_season), []
+                    game_at_bats.append(tuple(at_bat))
+
+            if game_at_bats:
+                game_keys.append(game_key)
+                yield game_at_bats
+
+        for encoded, row_count, errors in map_in_processes(
+            build_game_pitches, iter_games(), workers
+        ):
+            for error in errors:
+                print(error)
+            pending["blocks"].append(encoded)
+            pending["rows"] += row_count
+            pending["games"].append(game_keys.popleft())
+            pitches_count += row_count
+            if pending["rows"] >= batch_rows:
+                flush()
+
+        if pending["games"]:
+            flush()
+
         print(
-            f"Processed all pitches in {(datetime.now() - start_time).total_seconds() / 60:.2f} minutes"
+            f"Stored {pitches_count} Pitches for {at_bats_count} AtBats in {(datetime.now() - start_time).total_seconds() / 60:.2f} minutes"
         )
 
 
@@ -122,10 +279,22 @@ if __name__ == "__main__":
         type=int,
         help="Season to process. If not provided, processes all seasons.",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes building Pitch rows",
+    )
+    parser.add_argument(
+        "--batch-rows",
+        type=int,
+        default=5000,
+        help="AtBats fetched per batch and Pitches written per commit",
+    )
     args = parser.parse_args()
 
     print(
         f"Loading pitches for sport {args.sport_id}"
         + (f" for season {args.season}" if args.season else "")
     )
-    load_pitches(args.sport_id, args.season)
+    load_pitches(args.sport_id, args.season, args.workers, args.batch_rows)
@@ -1,30 +1,26 @@
 import argparse
-from datetime import datetime
+from datetime import date, datetime
 
-import statsapi
 from app.models import Player
 from app.schemas import PlayerSchema
+from app.scripts.bulk_write import upsert_rows
+from app.scripts.id_resolver import refresh_resolver
+from app.scripts.statsapi_cache import iter_season_responses
+from app.validation import validate_batch
 from sqlalchemy.orm import Session
 
 from app.scripts import db_engine
 
 
-def get_existing_players_map() -> dict:
-    with Session(db_engine) as session:
-        players = session.query(Player).all()
-        return {player.mlb_id: player for player in players}
-
-
 def get_players_data(sport_id: int, start_season: int, end_season: int) -> dict:
     players_map = {}
 
-    for season in range(start_season, end_season):
-        sports_players_api_response = (
-            statsapi.get("sports_players", {"sportId": sport_id, "season": season})
-            or {}
-        )
-
-        players = sports_players_api_response.get("people", [])
+    # Seasons are fetched concurrently but yielded in order, so later seasons
+    # still overwrite earlier ones
+    for season, sports_players_api_response in iter_season_responses(
+        "sports_players", sport_id, start_season, end_season
+    ):
+        players = (sports_players_api_response or {}).get("people", [])
         for player in players:
             player_id = player.get("id")
             # Always store the freshest data
@@ -39,80 +35,56 @@ def get_players_data(sport_id: int, start_season: int, end_season: int) -> dict:
     return players_map
 
 
+def parse_date(value: str) -> date:
+    return datetime.strptime(value, "%Y-%m-%d").date() if value else None
+
+
+def build_player_row(player_data: dict) -> dict:
+    return {
+        "mlb_id": int(player_data.get("id")),
+        "full_name": player_data.get("fullName"),
+        "is_player": player_data.get("isPlayer"),
+        "throws": player_data.get("pitchHand", {}).get("code"),
+        "bats": player_data.get("batSide", {}).get("code"),
+        "birth_date": parse_date(player_data.get("birthDate")),
+        "primary_position_code": player_data.get("primaryPosition", {}).get("code"),
+        "primary_position": player_data.get("primaryPosition", {}).get("name"),
+        "active": player_data.get("active"),
+        "mlb_debut_date": parse_date(player_data.get("mlbDebutDate")),
+        "last_played_date": parse_date(player_data.get("lastPlayedDate")),
+        "details": player_data,
+    }
+
+
 def load_players(sport_id: int, start_season: int, end_season: int) -> None:
     players_map = get_players_data(sport_id, start_season, end_season)
-    existing_players = get_existing_players_map()
 
     stats = {"updated": 0, "inserted": 0, "failed": 0}
 
+    player_rows = []
+    for player_data in players_map.values():
+        try:
+            player_rows.append(build_player_row(player_data))
+        except Exception as e:
+            stats["failed"] += 1
+            print(
+                f"Failed validation for player with mlb_id {player_data['id']}: {str(e)}"
+            )
+
+    # Validate all the players at once
+    players, errors = validate_batch(PlayerSchema, player_rows)
+    for i, error in errors:
+        stats["failed"] += 1
+        print(
+            f"Failed validation for player with mlb_id {player_rows[i]['mlb_id']}: {error}"
+        )
+
+    # Insert new players and update existing ones in a few set-based statements
     with Session(db_engine) as session:
-        # Disable autoflush during the entire operation
-        with session.no_autoflush:
-            for player_data in players_map.values():
-                try:
-                    player_mlb_id = int(player_data.get("id"))
-                    player_id = None
-                    if player_mlb_id in existing_players:
-                        player_id = existing_players[player_mlb_id].id
-
-                    player_instance = Player(
-                        id=player_id,
-                        mlb_id=int(player_data.get("id")),
-                        full_name=player_data.get("fullName"),
-                        is_player=player_data.get("isPlayer"),
-                        throws=player_data.get("pitchHand", {}).get("code"),
-                        bats=player_data.get("batSide", {}).get("code"),
-                        birth_date=datetime.strptime(
-                            player_data["birthDate"], "%Y-%m-%d"
-                        ).date()
-                        if player_data.get("birthDate")
-                        else None,
-                        primary_position_code=player_data.get(
-                            "primaryPosition", {}
-                        ).get("code"),
-                        primary_position=player_data.get("primaryPosition", {}).get(
-                            "name"
-                        ),
-                        active=player_data.get("active"),
-                        mlb_debut_date=datetime.strptime(
-                            player_data["mlbDebutDate"], "%Y-%m-%d"
-                        ).date()
-                        if player_data.get("mlbDebutDate")
-                        else None,
-                        last_played_date=datetime.strptime(
-                            player_data["lastPlayedDate"], "%Y-%m-%d"
-                        ).date()
-                        if player_data.get("lastPlayedDate")
-                        else None,
-                        details=player_data,
-                    )
-
-                    # Validate the player data
-                    PlayerSchema.from_orm(player_instance)
-
-                    # Check if player exists
-                    player_id = player_instance.mlb_id
-                    if player_id in existing_players:
-                        stats["updated"] += 1
-                    else:
-                        stats["inserted"] += 1
-
-                    # Merge will handle both insert and update
-                    # merge() already attaches the instance to the session
-                    session.merge(player_instance)
-
-                except Exception as e:
-                    stats["failed"] += 1
-                    print(
-                        f"Failed validation for player with mlb_id {player_data['id']}: {str(e)}"
-                    )
-                    session.rollback()
-
-            # Flush all changes at once
-            session.flush()
-
-        # Commit all changes
+        player_ids = {}
+        stats.update(upsert_rows(session, Player.__table__, players, ids=player_ids))
         session.commit()
+        refresh_resolver(Player, player_ids)
         print("Sync complete:")
         print(f"- Updated: {stats['updated']} players")
         print(f"- Inserted: {stats['inserted']} new players")
@@ -1,30 +1,25 @@
 import argparse
 
 from sqlalchemy.orm import Session
-import statsapi
 
 from app.scripts import db_engine
 from app.models import Team
 from app.schemas import TeamSchema
-
-
-def get_existing_teams_map() -> dict:
-    with Session(db_engine) as session:
-        teams = session.query(Team).all()
-        return {team.mlb_id: team for team in teams}
+from app.scripts.bulk_write import upsert_rows
+from app.scripts.statsapi_cache import iter_season_responses
+from app.validation import validate_batch
 
 
 def get_teams_data(sport_id, start_season, end_season):
     # Declare a teams_map.
     teams_map = {}
 
-    # Iterate over every season in the desired range.
-    for season in range(start_season, end_season):
+    # Fetch every season in the desired range concurrently, merging in season order.
+    for season, teams_api_response in iter_season_responses(
+        "teams", sport_id, start_season, end_season
+    ):
         # Extract the "teams" list from the response.
-        teams_api_response = (
-            statsapi.get("teams", {"sportId": sport_id, "season": season}) or {}
-        )
-        teams_list = teams_api_response.get("teams", [])
+        teams_list = (teams_api_response or {}).get("teams", [])
         # Write the team objects to the teams_map. Key is the team "id", value is the object.
         for team in teams_list:
             team_id = team.get("id")
@@ -40,61 +35,39 @@ def get_teams_data(sport_id, start_season, end_season):
     return teams_map
 
 
+def build_team_row(team_data: dict, sport_id: int) -> dict:
+    return {
+        "mlb_id": int(team_data.get("id")),
+        "sport_id": sport_id,
+        "name": team_data.get("name"),
+        "active": team_data.get("active", False),
+        "hometown": team_data.get("locationName"),
+        "details": team_data,
+    }
+
+
 def load_teams(sport_id, start_season, end_season):
-    # Get teams map and existing teams
+    # Get teams map
     teams_map = get_teams_data(sport_id, start_season, end_season)
-    existing_teams = get_existing_teams_map()
 
-    stats = {"updated": 0, "inserted": 0, "failed": 0}
+    # Validate all the teams at once
+    team_rows = [
+        build_team_row(team_data, sport_id) for team_data in teams_map.values()
+    ]
+    teams, errors = validate_batch(TeamSchema, team_rows)
+    for i, error in errors:
+        print(
+            f"Failed validation for team with mlb_id {team_rows[i]['mlb_id']}: {error}"
+        )
 
-    # With an open sqlalchemy Session,
+    # Insert new teams and update existing ones in a few set-based statements
     with Session(db_engine) as session:
-        # Disable autoflush during the entire operation
-        with session.no_autoflush:
-            # iterate over every team in the map.
-            for team_data in teams_map.values():
-                try:
-                    team_mlb_id = int(team_data.get("id"))
-                    team_id = None
-                    if team_mlb_id in existing_teams:
-                        team_id = existing_teams[team_mlb_id].id
-                        stats["updated"] += 1
-                    else:
-                        stats["inserted"] += 1
-
-                    # For every team, instantiate a Team object
-                    team_instance = Team(
-                        id=team_id,
-                        mlb_id=team_mlb_id,
-                        sport_id=sport_id,
-                        name=team_data.get("name"),
-                        active=team_data.get("active", False),
-                        hometown=team_data.get("locationName"),
-                        details=team_data,
-                    )
-
-                    # Validate the team data
-                    TeamSchema.from_orm(team_instance)
-
-                    # Merge will handle both insert and update
-                    session.merge(team_instance)
-
-                except Exception as e:
-                    stats["failed"] += 1
-                    print(
-                        f"Failed validation for team with mlb_id {team_data.get('id')}: {str(e)}"
-                    )
-                    session.rollback()
-
-            # Flush all changes at once
-            session.flush()
-
-        # Commit all changes
+        stats = upsert_rows(session, Team.__table__, teams)
         session.commit()
         print("Sync complete:")
         print(f"- Updated: {stats['updated']} teams")
         print(f"- Inserted: {stats['inserted']} new teams")
-        print(f"- Failed: {stats['failed']} teams")
+        print(f"- Failed: {len(errors)} teams")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,64 @@
+import concurrent.futures
+from collections import deque
+from functools import partial
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator, List
+
+
+# Transform bound to its shared arguments, set once per worker process
+_worker_transform = None
+
+
+def init_worker(transform: Callable, kwargs: dict) -> None:
+    global _worker_transform
+    _worker_transform = partial(transform, **kwargs)
+
+
+def run_chunk(chunk: List) -> List:
+    return [_worker_transform(item) for item in chunk]
+
+
+def iter_chunks(items: Iterable, size: int) -> Iterator[List]:
+    items = iter(items)
+    while chunk := list(islice(items, size)):
+        yield chunk
+
+
+def map_in_processes(
+    transform: Callable,
+    items: Iterable,
+    workers: int = 1,
+    chunk_size: int = 10,
+    max_pending: int = 4,
+    **kwargs: Any,
+) -> Iterator:
+    """
+    Yield transform(item, **kwargs) for every item, in input order.
+
+    With more than one worker the items are sent to a process pool in chunks
+    (e.g. chunk_size games per task). The kwargs, such as player id mappings,
+    are shipped once per worker through the pool initializer rather than with
+    every task. At most workers * max_pending chunks are in flight, so items
+    can be streamed from a cursor without reading them all into memory.
+
+    With a single worker the transform runs in-process and the results are
+    the same, in the same order.
+    """
+    if workers <= 1:
+        yield from map(partial(transform, **kwargs), items)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, initializer=init_worker, initargs=(transform, kwargs)
+    ) as executor:
+        chunks = iter_chunks(items, chunk_size)
+        pending = deque(
+            executor.submit(run_chunk, chunk)
+            for chunk in islice(chunks, workers * max_pending)
+        )
+        while pending:
+            results = pending.popleft().result()
+            chunk = next(chunks, None)
+            if chunk is not None:
+                pending.append(executor.submit(run_chunk, chunk))
+            yield from results
@@ -0,0 +1,205 @@
+import argparse
+from typing import Dict, Iterable, List
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from tabulate import tabulate
+
+from app.scripts import db_engine
+from app.scripts.pitch_snapshot import invalidate_pitch_snapshot
+
+
+# Tables partitioned by season, each referencing the one before it
+PARTITIONED_TABLES = ["at_bat_details", "at_bats", "pitches"]
+
+# Held while partitions are created so concurrent loaders do not race
+PARTITION_LOCK_KEY = 7_242_015
+
+
+def get_partition_name(table_name: str, season: int) -> str:
+    return f"{table_name}_{season}"
+
+
+def get_attached_seasons(session: Session) -> Dict[str, List[int]]:
+    """
+    Get the seasons that have a partition attached, per partitioned table.
+    """
+    rows = session.execute(
+        text(
+            """
+            SELECT parent.relname, child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = ANY(:tables)
+            """
+        ),
+        {"tables": PARTITIONED_TABLES},
+    ).all()
+    seasons = {table_name: [] for table_name in PARTITIONED_TABLES}
+    for table_name, partition_name in rows:
+        seasons[table_name].append(int(partition_name.rsplit("_", 1)[1]))
+    return {table_name: sorted(values) for table_name, values in seasons.items()}
+
+
+def ensure_season_partitions(seasons: Iterable[int]) -> List[int]:
+    """
+    Create the partitions of every partitioned table for the given seasons if
+    they do not exist yet. Loaders call it before writing a season, in its own
+    short transaction, since creating a partition locks the parent table.
+
+    Args:
+        seasons (Iterable[int]): The seasons about to be written
+
+    Returns:
+        List[int]: The seasons whose partitions were created
+    """
+    seasons = {season for season in seasons if season is not None}
+    with Session(db_engine) as session:
+        attached = get_attached_seasons(session)
+        missing = sorted(
+            season
+            for season in seasons
+            if any(season not in attached[table] for table in PARTITIONED_TABLES)
+        )
+        if not missing:
+            return []
+
+        session.execute(
+            text("SELECT pg_advisory_xact_lock(:key)"), {"key": PARTITION_LOCK_KEY}
+        )
+        for season in missing:
+            for table_name in PARTITIONED_TABLES:
+                session.execute(
+                    text(
+                        f"CREATE TABLE IF NOT EXISTS {get_partition_name(table_name, season)} "
+                        f"PARTITION OF {table_name} FOR VALUES FROM ({season}) TO ({season + 1})"
+                    )
+                )
+        session.commit()
+
+    print(f"Created partitions for seasons {', '.join(map(str, missing))}")
+    return missing
+
+
+def detach_season(season: int) -> None:
+    """
+    Detach a season's partitions, e.g. to archive or drop an old season without
+    touching the others. The detached tables keep their rows and get a CHECK
+    constraint on the season, so attaching them again skips the scan that
+    would otherwise prove every row belongs to the partition.
+
+    Games of the season stay marked as done in ingestion_state, so the loaders
+    do not reload a detached season. The pitch snapshot is invalidated, since
+    its pitches of the season are no longer served by Postgres.
+    """
+    with Session(db_engine) as session:
+        # Referencing tables first, so no attached row points at a detached one
+        for table_name in reversed(PARTITIONED_TABLES):
+            partition_name = get_partition_name(table_name, season)
+            session.execute(
+                text(f"ALTER TABLE {table_name} DETACH PARTITION {partition_name}")
+            )
+            # The foreign keys inherited from the parent stay on the detached
+            # table and would keep the referenced partition from detaching
+            foreign_keys = (
+                session.execute(
+                    text(
+                        """
+                        SELECT conname FROM pg_constraint
+                        WHERE conrelid = CAST(:partition_name AS regclass)
+                        AND contype = 'f'
+                        AND confrelid = ANY(CAST(:tables AS regclass[]))
+                        """
+                    ),
+                    {"partition_name": partition_name, "tables": PARTITIONED_TABLES},
+                )
+                .scalars()
+                .all()
+            )
+            for foreign_key in foreign_keys:
+                session.execute(
+                    text(
+                        f'ALTER TABLE {partition_name} DROP CONSTRAINT "{foreign_key}"'
+                    )
+                )
+            session.execute(
+                text(
+                    f"ALTER TABLE {partition_name} ADD CONSTRAINT {partition_name}_season_check "
+                    f"CHECK (season >= {season} AND season < {season + 1})"
+                )
+            )
+        session.commit()
+    invalidate_pitch_snapshot()
+    print(f"Detached the partitions of season {season}")
+
+
+def attach_season(season: int) -> None:
+    """
+    Attach the partitions of a season that were detached with detach_season.
+    The pitch snapshot is invalidated, since the pitches of the season are
+    below its watermark and would not be appended by a refresh.
+    """
+    with Session(db_engine) as session:
+        # Referenced tables first, so the foreign keys can be validated
+        for table_name in PARTITIONED_TABLES:
+            partition_name = get_partition_name(table_name, season)
+            session.execute(
+                text(
+                    f"ALTER TABLE {table_name} ATTACH PARTITION {partition_name} "
+                    f"FOR VALUES FROM ({season}) TO ({season + 1})"
+                )
+            )
+            session.execute(
+                text(
+                    f"ALTER TABLE {partition_name} DROP CONSTRAINT IF EXISTS {partition_name}_season_check"
+                )
+            )
+        session.commit()
+    invalidate_pitch_snapshot()
+    print(f"Attached the partitions of season {season}")
+
+
+def get_partition_sizes() -> List[Dict]:
+    """
+    Get the size of every attached partition, one row per season.
+    """
+    with Session(db_engine) as session:
+        attached = get_attached_seasons(session)
+        sizes = []
+        for season in sorted(set().union(*attached.values())):
+            row = {"season": season}
+            for table_name in PARTITIONED_TABLES:
+                row[table_name] = (
+                    session.execute(
+                        text(
+                            "SELECT pg_size_pretty(pg_total_relation_size(CAST(:name AS regclass)))"
+                        ),
+                        {"name": get_partition_name(table_name, season)},
+                    ).scalar()
+                    if season in attached[table_name]
+                    else None
+                )
+            sizes.append(row)
+        return sizes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Show, create, attach or detach the season partitions"
+    )
+    parser.add_argument(
+        "--create", type=int, nargs="+", help="Seasons to create partitions for"
+    )
+    parser.add_argument("--detach", type=int, help="Season to detach")
+    parser.add_argument("--attach", type=int, help="Season to attach again")
+    args = parser.parse_args()
+
+    if args.create:
+        ensure_season_partitions(args.create)
+    if args.detach is not None:
+        detach_season(args.detach)
+    if args.attach is not None:
+        attach_season(args.attach)
+
+    print(tabulate(get_partition_sizes(), headers="keys", tablefmt="github"))
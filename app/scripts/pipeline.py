@@ -0,0 +1,348 @@
+import argparse
+import json
+import os
+import sys
+import traceback
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date, datetime
+from functools import partial
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+
+from app.scripts.constants import (
+    LEAGUE_MAP,
+    PIPELINE_CHECKPOINT_PATH,
+    PIPELINE_STAGE_LIMITS,
+)
+from app.scripts.ingest_games import ingest_games
+from app.scripts.load_at_bat_details import load_at_bat_details
+from app.scripts.load_at_bats import load_at_bats
+from app.scripts.load_games import load_games
+from app.scripts.load_pitches import load_pitches
+from app.scripts.load_players import load_players
+from app.scripts.load_teams import load_teams
+from app.scripts.pitch_snapshot import refresh_pitch_snapshot
+
+
+def build_tasks(
+    sport_ids: List[int],
+    start_season: int,
+    end_season: int,
+    fused: bool = False,
+    async_fetch: bool = False,
+    workers: int = 1,
+    pitch_snapshot: bool = False,
+) -> Dict[str, Dict]:
+    """
+    Build the DAG of loader tasks. Teams and players are loaded once per league
+    for the whole season range, since load_players keeps the freshest season of
+    each player. Everything else is partitioned by (league, season):
+
+        teams -> games -> at_bat_details -> at_bats -> pitches
+        players ----------------------------^
+
+    With fused, ingest_games replaces the last three stages. With
+    pitch_snapshot, a last task refreshes the pitch snapshot once every other
+    task is done.
+
+    Args:
+        sport_ids (List[int]): The leagues to load
+        start_season (int): First season to load
+        end_season (int): Season to stop at (exclusive)
+        fused (bool): Load at-bat details, at-bats and pitches in a single pass
+        async_fetch (bool): Fetch play-by-play data with the asyncio fetcher
+        workers (int): Worker processes for the at-bat and pitch transforms
+        pitch_snapshot (bool): Refresh the pitch snapshot at the end
+
+    Returns:
+        Dict[str, Dict]: Task key -> {"stage", "run", "depends_on"}, with every
+        task listed after the tasks it depends on
+    """
+    tasks = {}
+
+    def add_task(key, stage, run, depends_on):
+        tasks[key] = {"stage": stage, "run": run, "depends_on": depends_on}
+        return key
+
+    for sport_id in sport_ids:
+        seasons = f"{start_season}-{end_season - 1}"
+        teams = add_task(
+            f"teams:{sport_id}:{seasons}",
+            "teams",
+            partial(load_teams, sport_id, start_season, end_season),
+            [],
+        )
+        players = add_task(
+            f"players:{sport_id}:{seasons}",
+            "players",
+            partial(load_players, sport_id, start_season, end_season),
+            [],
+        )
+
+        for season in range(start_season, end_season):
+            games = add_task(
+                f"games:{sport_id}:{season}",
+                "games",
+                partial(load_games, sport_id, date(season, 1, 1), date(season, 12, 31)),
+                [teams],
+            )
+            if fused:
+                add_task(
+                    f"ingest_games:{sport_id}:{season}",
+                    "ingest_games",
+                    partial(ingest_games, sport_id, season, async_fetch),
+                    [games, players],
+                )
+                continue
+
+            at_bat_details = add_task(
+                f"at_bat_details:{sport_id}:{season}",
+                "at_bat_details",
+                partial(load_at_bat_details, sport_id, season, async_fetch=async_fetch),
+                [games],
+            )
+            at_bats = add_task(
+                f"at_bats:{sport_id}:{season}",
+                "at_bats",
+                partial(load_at_bats, sport_id, season, workers=workers),
+                [at_bat_details, players],
+            )
+            add_task(
+                f"pitches:{sport_id}:{season}",
+                "pitches",
+                partial(load_pitches, sport_id, season, workers=workers),
+                [at_bats],
+            )
+
+    if pitch_snapshot:
+        add_task(
+            "pitch_snapshot", "pitch_snapshot", refresh_pitch_snapshot, list(tasks)
+        )
+
+    return tasks
+
+
+def load_checkpoint(path: Path) -> Set[str]:
+    """
+    Get the keys of the tasks completed by previous runs.
+    """
+    if not path.exists():
+        return set()
+    with open(path) as f:
+        return set(json.load(f)["completed"])
+
+
+def save_checkpoint(path: Path, completed: Set[str]) -> None:
+    """
+    Write the completed task keys to a temporary file and rename it over the
+    checkpoint, so a crash never leaves a truncated file behind.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump({"completed": sorted(completed)}, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def run_tasks(
+    tasks: Dict[str, Dict],
+    max_workers: int = 8,
+    stage_limits: Dict[str, int] = PIPELINE_STAGE_LIMITS,
+    checkpoint_path: Path = None,
+) -> Dict[str, List[str]]:
+    """
+    Run the tasks on a thread pool as soon as their dependencies are done,
+    keeping at most stage_limits[stage] tasks of each stage running at once.
+
+    Completed tasks are recorded in the checkpoint, and tasks already in it are
+    not run again. A failed task does not stop the run: its dependents are
+    skipped and every other partition carries on. Within a stage the loaders
+    also resume per game from ingestion_state, so rerunning a failed task only
+    does the work that is left.
+
+    Args:
+        tasks (Dict[str, Dict]): The tasks from build_tasks
+        max_workers (int): Tasks to run at once across all stages
+        stage_limits (Dict[str, int]): Tasks to run at once per stage
+        checkpoint_path (Path, optional): Where to keep the completed task keys
+
+    Returns:
+        Dict[str, List[str]]: The task keys that were completed, already
+        completed by a previous run, failed and skipped
+    """
+    previously_completed = set()
+    if checkpoint_path is not None:
+        previously_completed = load_checkpoint(checkpoint_path) & set(tasks)
+
+    status = {
+        key: "completed" if key in previously_completed else "pending" for key in tasks
+    }
+    running = {}
+    running_per_stage = Counter()
+    completed = set(previously_completed)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while True:
+            # Dependencies come first in tasks, so one pass propagates skips
+            for key, task in tasks.items():
+                if status[key] != "pending":
+                    continue
+                dependency_status = [status[dep] for dep in task["depends_on"]]
+                if any(s in ("failed", "skipped") for s in dependency_status):
+                    status[key] = "skipped"
+                    print(f"Skipping {key}: a dependency failed")
+                    continue
+                if any(s != "completed" for s in dependency_status):
+                    continue
+                stage = task["stage"]
+                stage_limit = stage_limits.get(stage, 1)
+                if (
+                    len(running) >= max_workers
+                    or running_per_stage[stage] >= stage_limit
+                ):
+                    continue
+
+                print(f"Starting {key}")
+                status[key] = "running"
+                running_per_stage[stage] += 1
+                running[executor.submit(task["run"])] = (key, datetime.now())
+
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                key, start_time = running.pop(future)
+                running_per_stage[tasks[key]["stage"]] -= 1
+                elapsed = (datetime.now() - start_time).total_seconds() / 60
+                try:
+                    future.result()
+                except Exception:
+                    status[key] = "failed"
+                    print(f"Failed {key} after {elapsed:.2f} minutes")
+                    traceback.print_exc()
+                    continue
+
+                status[key] = "completed"
+                completed.add(key)
+                if checkpoint_path is not None:
+                    save_checkpoint(checkpoint_path, completed)
+                print(f"Completed {key} in {elapsed:.2f} minutes")
+
+    results = {"completed": [], "already_completed": [], "failed": [], "skipped": []}
+    for key in tasks:
+        if key in previously_completed:
+            results["already_completed"].append(key)
+        else:
+            results[status[key]].append(key)
+    return results
+
+
+def parse_stage_limit(value: str) -> Tuple[str, int]:
+    """
+    Parse a "stage=N" --stage-limit argument.
+    """
+    stage, _, limit = value.partition("=")
+    if stage not in PIPELINE_STAGE_LIMITS or not limit.isdigit() or int(limit) < 1:
+        raise argparse.ArgumentTypeError(
+            f"expected stage=N with N >= 1 and stage one of {', '.join(PIPELINE_STAGE_LIMITS)}"
+        )
+    return stage, int(limit)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Load leagues and seasons end to end, running independent "
+        "partitions concurrently"
+    )
+    parser.add_argument(
+        "--sport-ids",
+        type=int,
+        nargs="+",
+        default=list(LEAGUE_MAP),
+        choices=list(LEAGUE_MAP),
+        help="IDs of the leagues to load. Defaults to all of them.",
+    )
+    parser.add_argument("--start-season", type=int, required=True, help="Start season")
+    parser.add_argument(
+        "--end-season", type=int, required=True, help="End season (exclusive)"
+    )
+    parser.add_argument(
+        "--max-workers", type=int, default=8, help="Tasks to run at once"
+    )
+    parser.add_argument(
+        "--stage-limit",
+        type=parse_stage_limit,
+        action="append",
+        default=[],
+        help="Tasks of a stage to run at once, as stage=N. Can be repeated.",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        type=str,
+        default=PIPELINE_CHECKPOINT_PATH,
+        help="File recording the completed tasks, used to resume a run",
+    )
+    parser.add_argument(
+        "--reset",
+        action="store_true",
+        help="Ignore the tasks completed by previous runs",
+    )
+    parser.add_argument(
+        "--fused",
+        action="store_true",
+        help="Load at-bat details, at-bats and pitches in a single pass",
+    )
+    parser.add_argument(
+        "--async-fetch",
+        action="store_true",
+        help="Use the asyncio fetcher for play-by-play data",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Worker processes for the at-bat and pitch transforms",
+    )
+    parser.add_argument(
+        "--pitch-snapshot",
+        action="store_true",
+        help="Refresh the local Parquet snapshot of the pitches once loaded",
+    )
+    args = parser.parse_args()
+
+    checkpoint_path = Path(args.checkpoint).expanduser()
+    if args.reset and checkpoint_path.exists():
+        checkpoint_path.unlink()
+
+    tasks = build_tasks(
+        args.sport_ids,
+        args.start_season,
+        args.end_season,
+        args.fused,
+        args.async_fetch,
+        args.workers,
+        args.pitch_snapshot,
+    )
+    print(
+        f"Running {len(tasks)} tasks for {len(args.sport_ids)} leagues "
+        f"from {args.start_season} to {args.end_season - 1}"
+    )
+    start_time = datetime.now()
+    results = run_tasks(
+        tasks,
+        args.max_workers,
+        {**PIPELINE_STAGE_LIMITS, **dict(args.stage_limit)},
+        checkpoint_path,
+    )
+
+    print(
+        f"\nPipeline finished in {(datetime.now() - start_time).total_seconds() / 60:.2f} minutes"
+    )
+    for outcome, keys in results.items():
+        print(f"- {outcome}: {len(keys)}")
+    for key in results["failed"]:
+        print(f"  failed: {key}")
+    if results["failed"]:
+        sys.exit(1)
@@ -0,0 +1,288 @@
+import argparse
+import json
+import os
+import shutil
+from datetime import datetime
+from functools import reduce
+from pathlib import Path
+from typing import Dict, Optional
+
+import adbc_driver_postgresql.dbapi as dbapi
+import pandas as pd
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+from sqlalchemy import text
+
+from app.scripts import db_engine
+from app.scripts.constants import PITCH_SNAPSHOT_BATCH_SIZE, PITCH_SNAPSHOT_DIR
+
+
+DB_URI = db_engine.url.render_as_string(hide_password=False)
+
+# Effective batter hand: a switch batter bats from the side opposite the pitcher's hand
+BATTER_HAND_SQL = """CASE batter.details->'batSide'->>'code'
+        WHEN 'S' THEN
+            CASE pitcher.details->'pitchHand'->>'code' WHEN 'L' THEN 'R' ELSE 'L' END
+        ELSE batter.details->'batSide'->>'code'
+    END"""
+
+# Columns of the denormalized pitch rows: name -> SQL expression. Only what the
+# profiling functions read and filter on, the play JSON is never fetched.
+PITCH_COLUMNS = {
+    "id": "p.id",
+    "season": "p.season",
+    "ab_id": "p.at_bat_id",
+    "pitch_type_code": "p.pitch_type_code",
+    "start_speed": "p.start_speed",
+    "zone": "p.zone",
+    "call_code": "p.call_code",
+    "ball_count": "p.ball_count",
+    "strike_count": "p.strike_count",
+    "px": "p.px",
+    "pz": "p.pz",
+    "batter_sz_top": "p.strike_zone_top",
+    "batter_sz_bottom": "p.strike_zone_bottom",
+    "sport_id": "g.sport_id",
+    "game_type": "g.game_type",
+    "pitcher_id": "ab.pitcher_id",
+    "batter_id": "ab.batter_id",
+    "batter_name": "batter.full_name",
+    "pitcher_name": "pitcher.full_name",
+    "batter_hand": BATTER_HAND_SQL,
+    "pitcher_hand": "pitcher.details->'pitchHand'->>'code'",
+}
+
+PITCHES_QUERY = (
+    "SELECT\n    "
+    + ",\n    ".join(
+        f"{expression} as {name}" for name, expression in PITCH_COLUMNS.items()
+    )
+    + """
+    FROM pitches p
+    JOIN at_bats ab ON p.at_bat_id = ab.id AND p.season = ab.season
+    JOIN games g ON ab.game_id = g.id
+    JOIN players batter ON ab.batter_id = batter.id
+    JOIN players pitcher ON ab.pitcher_id = pitcher.id
+    """
+)
+
+SNAPSHOT_PARTITIONING = ["sport_id", "season"]
+# Files starting with "_" are skipped when the snapshot is read as a dataset
+WATERMARK_FILE = "_watermark.json"
+
+
+def query_live_pitches(filters: Dict[str, object]) -> pd.DataFrame:
+    """
+    Get the pitch rows matching every filter (column -> value, or list of
+    values) from Postgres. The values are passed as query parameters.
+    Filtering on season lets Postgres skip the partitions of every other season.
+    """
+    conditions = [
+        f"{PITCH_COLUMNS[name]} = ANY(${position})"
+        if isinstance(value, list)
+        else f"{PITCH_COLUMNS[name]} = ${position}"
+        for position, (name, value) in enumerate(filters.items(), start=1)
+    ]
+    pitches_query = PITCHES_QUERY
+    if conditions:
+        pitches_query += "WHERE " + " AND ".join(conditions)
+
+    # Start a DB connection using the adbc postgres driver for better perf
+    with dbapi.connect(DB_URI) as conn, conn.cursor() as cursor:
+        cursor.execute(pitches_query, list(filters.values()))
+        return cursor.fetch_df().set_index("id")
+
+
+def get_watermark(directory: str = PITCH_SNAPSHOT_DIR) -> Optional[Dict]:
+    """
+    Get the watermark of a snapshot, or None if there is no snapshot.
+    """
+    path = Path(directory).expanduser() / WATERMARK_FILE
+    if not path.exists():
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_watermark(directory: Path, pitch_id: int, stale: bool = False) -> None:
+    """
+    Record the last snapshotted pitch id, and whether rows below it were since
+    changed. The file is replaced in one step, so a crash never leaves
+    a truncated watermark behind.
+    """
+    path = directory / WATERMARK_FILE
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(
+            {
+                "pitch_id": pitch_id,
+                "stale": stale,
+                "refreshed_at": datetime.now().isoformat(),
+            },
+            f,
+            indent=2,
+        )
+    os.replace(tmp_path, path)
+
+
+def invalidate_pitch_snapshot(directory: str = PITCH_SNAPSHOT_DIR) -> None:
+    """
+    Mark the snapshot as stale after pitches or at_bats were updated in place,
+    or a season's partitions were attached or detached. It is no longer read,
+    and its next refresh rebuilds it.
+    """
+    watermark = get_watermark(directory)
+    if watermark is not None and not watermark.get("stale"):
+        save_watermark(Path(directory).expanduser(), watermark["pitch_id"], stale=True)
+
+
+def get_max_pitch_id() -> int:
+    """
+    Get the highest pitch id in Postgres, 0 if there are no pitches. Answered
+    from the end of each partition's primary key index.
+    """
+    with db_engine.connect() as connection:
+        return connection.execute(text("SELECT max(id) FROM pitches")).scalar() or 0
+
+
+def read_snapshot_pitches(
+    filters: Dict[str, object], directory: str = PITCH_SNAPSHOT_DIR
+) -> Optional[pd.DataFrame]:
+    """
+    Get the pitch rows matching every filter (column -> value, or list of
+    values) from the snapshot. Filters on sport_id and season only open the
+    matching partition directories, the others are pushed down to the Parquet
+    row group statistics.
+
+    Returns None, for the caller to query Postgres instead, if there is no
+    snapshot, if it is empty, if it was invalidated, or if Postgres has
+    pitches above its watermark.
+    """
+    watermark = get_watermark(directory)
+    if watermark is None or watermark.get("stale"):
+        return None
+    if get_max_pitch_id() > watermark["pitch_id"]:
+        return None
+
+    dataset = ds.dataset(
+        Path(directory).expanduser(),
+        format="parquet",
+        partitioning="hive",
+    )
+    # No file means no schema to resolve the columns and filters against
+    if not dataset.files:
+        return None
+    expression = reduce(
+        lambda left, right: left & right,
+        (
+            pc.field(name).isin(value)
+            if isinstance(value, list)
+            else pc.field(name) == value
+            for name, value in filters.items()
+        ),
+        pc.scalar(True),
+    )
+    table = dataset.to_table(columns=list(PITCH_COLUMNS), filter=expression)
+    return table.to_pandas().set_index("id")
+
+
+def refresh_pitch_snapshot(
+    directory: str = PITCH_SNAPSHOT_DIR,
+    rebuild: bool = False,
+    batch_size: int = PITCH_SNAPSHOT_BATCH_SIZE,
+) -> int:
+    """
+    Append the pitches above the snapshot's watermark to the snapshot, in
+    batches of batch_size rows ordered by id. Every batch is written as one
+    file per (sport_id, season) named after the watermark it starts from, then
+    the watermark moves up, so an interrupted refresh redoes at most one batch
+    and overwrites its files. Run it once the loaders are done: pitch ids are
+    taken from a sequence when inserted, so a concurrent load may still commit
+    ids below the new watermark.
+
+    Rows are never updated in place. A snapshot invalidated after pitches or
+    at_bats were changed (by backfill_pitch_data, fix_atbat_substitutions or
+    attaching or detaching a season's partitions) is rebuilt instead, as it is with rebuild, e.g. to compact the files of
+    many small refreshes: it is written to a sibling directory and swapped in
+    once complete.
+
+    Args:
+        directory (str): Where the snapshot is kept
+        rebuild (bool): Snapshot every pitch again instead of appending
+        batch_size (int): Pitches fetched and written per batch
+
+    Returns:
+        int: The number of pitches added
+    """
+    directory = Path(directory).expanduser()
+    watermark = get_watermark(directory)
+    if watermark is not None and watermark.get("stale") and not rebuild:
+        print("The snapshot was invalidated, rebuilding it")
+        rebuild = True
+    target = directory.with_name(f"{directory.name}.rebuild") if rebuild else directory
+    if rebuild:
+        shutil.rmtree(target, ignore_errors=True)
+    target.mkdir(parents=True, exist_ok=True)
+
+    watermark = get_watermark(target)
+    pitch_id = watermark["pitch_id"] if watermark else 0
+    start_time = datetime.now()
+    added = 0
+    with dbapi.connect(DB_URI) as conn, conn.cursor() as cursor:
+        while True:
+            cursor.execute(
+                PITCHES_QUERY + "WHERE p.id > $1 ORDER BY p.id LIMIT $2",
+                [pitch_id, batch_size],
+            )
+            table = cursor.fetch_arrow_table()
+            if table.num_rows == 0:
+                break
+
+            ds.write_dataset(
+                table,
+                target,
+                format="parquet",
+                partitioning=SNAPSHOT_PARTITIONING,
+                partitioning_flavor="hive",
+                basename_template=f"part-{pitch_id}-{{i}}.parquet",
+                existing_data_behavior="overwrite_or_ignore",
+            )
+            pitch_id = pc.max(table["id"]).as_py()
+            save_watermark(target, pitch_id)
+            added += table.num_rows
+            print(f"Snapshotted {added} pitches (up to id {pitch_id})")
+
+    if watermark is None and added == 0:
+        save_watermark(target, pitch_id)
+
+    if rebuild:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(target, directory)
+
+    print(
+        f"Added {added} pitches to the snapshot in {(datetime.now() - start_time).total_seconds() / 60:.2f} minutes"
+    )
+    return added
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Refresh the local Parquet snapshot of the pitches"
+    )
+    parser.add_argument(
+        "--directory", default=PITCH_SNAPSHOT_DIR, help="Where the snapshot is kept"
+    )
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Snapshot every pitch again, e.g. after pitches or at_bats were updated",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=PITCH_SNAPSHOT_BATCH_SIZE,
+        help="Pitches fetched and written per batch",
+    )
+    args = parser.parse_args()
+
+    refresh_pitch_snapshot(args.directory, args.rebuild, args.batch_size)
@@ -0,0 +1,218 @@
+import concurrent.futures
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+import statsapi
+import zstandard
+
+from app.scripts.constants import (
+    FINAL_GAME_STATUSES,
+    STATSAPI_CACHE_DEFAULT_TTL,
+    STATSAPI_CACHE_DIR,
+    STATSAPI_CACHE_MAX_BYTES,
+    STATSAPI_CACHE_TTLS,
+    STATSAPI_SEASON_FETCH_WORKERS,
+)
+
+
+def get_cache_key(endpoint: str, params: Dict) -> str:
+    """
+    Content address of a request: a hash of the endpoint and its params, so
+    the same call always maps to the same file regardless of param order.
+    """
+    request = json.dumps(
+        {"endpoint": endpoint, "params": params}, sort_keys=True, default=str
+    )
+    return hashlib.sha256(request.encode("utf-8")).hexdigest()
+
+
+def is_empty_response(response: Any) -> bool:
+    if not response:
+        return True
+    # Postponed or not yet started games come back without any plays
+    if isinstance(response, dict) and "allPlays" in response:
+        return not response["allPlays"]
+    return False
+
+
+def is_final_game_status(status: Optional[str]) -> bool:
+    """
+    Whether a schedule status means the game is over, so its play-by-play
+    will not change anymore.
+    """
+    return bool(status) and status.startswith(FINAL_GAME_STATUSES)
+
+
+class ResponseCache:
+    """
+    On-disk, zstd-compressed cache of raw StatsAPI responses.
+
+    Entries live at <directory>/<key[:2]>/<key>.zst. Each entry records when it
+    was fetched so it can be expired with the per-endpoint TTLs, unless it was
+    stored as permanent (e.g. the play-by-play of a final game). Reads bump the
+    file's mtime, and once the cache grows past max_bytes the least recently
+    used entries are evicted.
+    """
+
+    def __init__(
+        self,
+        directory: str = STATSAPI_CACHE_DIR,
+        max_bytes: int = STATSAPI_CACHE_MAX_BYTES,
+        ttls: Dict[str, Optional[int]] = STATSAPI_CACHE_TTLS,
+    ):
+        self.directory = Path(directory).expanduser()
+        self.max_bytes = max_bytes
+        self.ttls = ttls
+        self.size = None
+        self.lock = threading.Lock()
+        self.enabled = True
+
+    def get_path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.zst"
+
+    def get_ttl(self, endpoint: str) -> Optional[int]:
+        return self.ttls.get(endpoint, STATSAPI_CACHE_DEFAULT_TTL)
+
+    def get(self, endpoint: str, params: Dict) -> Optional[Any]:
+        if not self.enabled:
+            return None
+
+        path = self.get_path(get_cache_key(endpoint, params))
+        try:
+            compressed = path.read_bytes()
+        except FileNotFoundError:
+            return None
+
+        entry = json.loads(zstandard.ZstdDecompressor().decompress(compressed))
+        ttl = None if entry.get("permanent") else self.get_ttl(endpoint)
+        if ttl is not None and time.time() - entry["fetched_at"] > ttl:
+            return None
+
+        # Mark as recently used for LRU eviction
+        os.utime(path)
+        return entry["response"]
+
+    def put(
+        self, endpoint: str, params: Dict, response: Any, permanent: bool = False
+    ) -> None:
+        if not self.enabled or is_empty_response(response):
+            return
+
+        entry = {
+            "endpoint": endpoint,
+            "params": params,
+            "fetched_at": time.time(),
+            "permanent": permanent,
+            "response": response,
+        }
+        compressed = zstandard.ZstdCompressor(level=10).compress(
+            json.dumps(entry, default=str).encode("utf-8")
+        )
+
+        path = self.get_path(get_cache_key(endpoint, params))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        previous_size = path.stat().st_size if path.exists() else 0
+        # Write to a temp file first so concurrent readers never see partial entries
+        with tempfile.NamedTemporaryFile(dir=path.parent, delete=False) as tmp_file:
+            tmp_file.write(compressed)
+        os.replace(tmp_file.name, path)
+
+        with self.lock:
+            if self.size is None:
+                self.size = self.get_total_size()
+            else:
+                self.size += len(compressed) - previous_size
+            if self.size > self.max_bytes:
+                self.evict()
+
+    def get_or_fetch(
+        self,
+        endpoint: str,
+        params: Dict,
+        fetch: Callable[[], Any],
+        permanent: bool = False,
+    ) -> Any:
+        response = self.get(endpoint, params)
+        if response is None:
+            response = fetch()
+            self.put(endpoint, params, response, permanent)
+        return response
+
+    def get_total_size(self) -> int:
+        return sum(path.stat().st_size for path in self.directory.glob("*/*.zst"))
+
+    def evict(self) -> None:
+        """
+        Remove least recently used entries until the cache is back under 90%
+        of max_bytes. Must be called with the lock held.
+        """
+        entries = []
+        for path in self.directory.glob("*/*.zst"):
+            stat = path.stat()
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        self.size = sum(size for _, size, _ in entries)
+        target_size = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if self.size <= target_size:
+                break
+            path.unlink(missing_ok=True)
+            self.size -= size
+
+
+response_cache = ResponseCache()
+
+
+def cached_get(endpoint: str, params: Dict, permanent: bool = False) -> Any:
+    """
+    Drop-in replacement for statsapi.get that goes through the response cache.
+    With permanent, the response never expires.
+    """
+    return response_cache.get_or_fetch(
+        endpoint, params, lambda: statsapi.get(endpoint, params), permanent
+    )
+
+
+def cached_call(endpoint: str, params: Dict, fetch: Callable[[], Any]) -> Any:
+    """
+    Cache the result of any statsapi helper (e.g. statsapi.schedule) under
+    the given endpoint name and params.
+    """
+    return response_cache.get_or_fetch(endpoint, params, fetch)
+
+
+def iter_season_responses(
+    endpoint: str,
+    sport_id: int,
+    start_season: int,
+    end_season: int,
+    max_workers: int = STATSAPI_SEASON_FETCH_WORKERS,
+) -> Iterator[Tuple[int, Any]]:
+    """
+    Fetch an endpoint for every season of a league over a bounded thread pool.
+    Responses are yielded as (season, response) in season order, whatever
+    order the requests finish in, so callers can merge them deterministically.
+
+    Args:
+        endpoint (str): The statsapi endpoint, e.g. "teams"
+        sport_id (int): The ID of the sport/league
+        start_season (int): First season to fetch
+        end_season (int): Season to stop at (exclusive)
+        max_workers (int): Requests to have in flight at once
+    """
+    seasons = range(start_season, end_season)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        responses = executor.map(
+            lambda season: cached_get(
+                endpoint, {"sportId": sport_id, "season": season}
+            ),
+            seasons,
+        )
+        yield from zip(seasons, responses)
@@ -0,0 +1,190 @@
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+import statsapi
+
+
+UPSTREAM_URL = statsapi.BASE_URL.rstrip("/").removesuffix("/api")
+
+
+def get_fixture_name(path: str, query: str) -> str:
+    """
+    Fixture file name for a request, e.g. api_v1_game_745444_playByPlay.json.
+    Requests with a query string get a short hash of the sorted params appended
+    so the name does not depend on param order.
+    """
+    name = re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_")
+    params = sorted(parse_qsl(query, keep_blank_values=True))
+    if params:
+        name += "__" + hashlib.sha1(urlencode(params).encode()).hexdigest()[:12]
+    return f"{name}.json"
+
+
+class FixtureStore:
+    """
+    Directory of recorded StatsAPI responses, one JSON file per request.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def load(self, path: str, query: str) -> Optional[bytes]:
+        fixture_path = self.directory / get_fixture_name(path, query)
+        if not fixture_path.exists():
+            return None
+        return fixture_path.read_bytes()
+
+    def save(self, path: str, query: str, body: bytes) -> None:
+        fixture_path = self.directory / get_fixture_name(path, query)
+        fixture_path.write_bytes(body)
+
+
+class ReplayServer(ThreadingHTTPServer):
+    """
+    Local stand-in for the MLB StatsAPI.
+
+    Serves recorded fixtures with an injected latency (seconds, +/- jitter)
+    and error rate (fraction of requests answered with a 503). In record mode
+    missing fixtures are fetched from the real API and saved.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        store: FixtureStore,
+        port: int = 8765,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        record: bool = False,
+        seed: int = None,
+    ):
+        super().__init__(("127.0.0.1", port), ReplayRequestHandler)
+        self.store = store
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.record = record
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+        self.stats = {"served": 0, "recorded": 0, "missing": 0, "errors": 0}
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def get_delay_and_error(self) -> tuple:
+        with self.random_lock:
+            delay = self.latency + self.random.uniform(-self.jitter, self.jitter)
+            is_error = self.random.random() < self.error_rate
+        return max(delay, 0.0), is_error
+
+
+class ReplayRequestHandler(BaseHTTPRequestHandler):
+    server: ReplayServer
+
+    def log_message(self, format, *args) -> None:
+        return
+
+    def send_body(self, status: int, body: bytes) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        delay, is_error = self.server.get_delay_and_error()
+        time.sleep(delay)
+
+        if is_error:
+            self.server.stats["errors"] += 1
+            self.send_body(503, b'{"message": "Injected error"}')
+            return
+
+        body = self.server.store.load(url.path, url.query)
+        if body is None and self.server.record:
+            response = requests.get(UPSTREAM_URL + self.path, timeout=60)
+            if response.status_code == 200:
+                body = response.content
+                self.server.store.save(url.path, url.query, body)
+                self.server.stats["recorded"] += 1
+
+        if body is None:
+            self.server.stats["missing"] += 1
+            self.send_body(404, json.dumps({"message": "No fixture"}).encode())
+            return
+
+        self.server.stats["served"] += 1
+        self.send_body(200, body)
+
+
+def use_replay_server(base_url: str) -> None:
+    """
+    Point every statsapi endpoint (and so every loader) at base_url instead of
+    the real StatsAPI.
+    """
+    for endpoint in statsapi.ENDPOINTS.values():
+        endpoint["url"] = endpoint["url"].replace(
+            statsapi.BASE_URL, base_url.rstrip("/") + "/api/"
+        )
+
+
+def start_replay_server(store: FixtureStore, **kwargs) -> ReplayServer:
+    """
+    Start a ReplayServer on a background thread and point statsapi at it.
+    """
+    server = ReplayServer(store, **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    use_replay_server(server.base_url)
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve recorded StatsAPI fixtures")
+    parser.add_argument(
+        "--fixtures", type=str, required=True, help="Fixtures directory"
+    )
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Injected latency in seconds"
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=0.0, help="Latency jitter in seconds"
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of requests answered with a 503",
+    )
+    parser.add_argument(
+        "--record",
+        action="store_true",
+        help="Fetch and save missing fixtures from the real StatsAPI",
+    )
+    args = parser.parse_args()
+
+    server = ReplayServer(
+        FixtureStore(args.fixtures),
+        port=args.port,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        record=args.record,
+    )
+    print(f"Serving StatsAPI fixtures from {args.fixtures} at {server.base_url}")
+    server.serve_forever()
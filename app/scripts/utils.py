@@ -1,3 +1,5 @@
+from typing import Dict, List
+
 import statsapi
 
 from . import constants
@@ -12,3 +14,12 @@ def get_mlb_id() -> int:
     )
 
     return mlb_sport.get("id")
+
+
+def get_at_bat_plays(game_plays_data: Dict) -> List[Dict]:
+    """
+    Select the at-bats from a "game_playByPlay" api response.
+    Only plays where play["result"]["type"] == "atBat" are kept.
+    """
+    all_plays = game_plays_data.get("allPlays", [])
+    return [play for play in all_plays if play.get("result", {}).get("type") == "atBat"]
@@ -0,0 +1,90 @@
+from datetime import date, datetime
+from typing import Dict, List, Sequence, Tuple, Type, Union
+
+from pydantic import BaseModel
+
+
+# Python types accepted for each schema field type. Checks are plain instance
+# checks on the raw values, no coercion is attempted.
+ACCEPTED_TYPES = {
+    int: (int,),
+    float: (float, int),
+    bool: (bool,),
+    str: (str,),
+    dict: (dict,),
+    date: (date, datetime),
+}
+
+
+def get_field_specs(schema: Type[BaseModel]) -> List[Tuple[str, tuple, bool]]:
+    """
+    Get (name, accepted types, allows None) for every field of a schema.
+    """
+    specs = []
+    for name, field in schema.__fields__.items():
+        accepted_types = ACCEPTED_TYPES.get(field.outer_type_, (field.outer_type_,))
+        specs.append((name, accepted_types, field.allow_none))
+    return specs
+
+
+def get_column(
+    rows: Sequence[Union[Dict, Sequence]], name: str, columns: Sequence[str] = None
+) -> Sequence:
+    if columns is None:
+        return [row.get(name) for row in rows]
+    if name not in columns:
+        return [None] * len(rows)
+    index = columns.index(name)
+    return [row[index] for row in rows]
+
+
+def validate_batch(
+    schema: Type[BaseModel],
+    rows: Sequence[Union[Dict, Sequence]],
+    columns: Sequence[str] = None,
+) -> Tuple[List, List[Tuple[int, str]]]:
+    """
+    Validate a whole batch of rows against a schema from app.schemas, one
+    column at a time, without building ORM instances or pydantic models.
+
+    Each column is checked for missing values on non-Optional fields and for
+    values of the wrong type. When a column only holds accepted types (the
+    common case), it is cleared with a single set comparison instead of a
+    check per row.
+
+    Args:
+        schema (Type[BaseModel]): The schema to validate against (e.g. PitchSchema)
+        rows (Sequence): Rows as dicts, or as tuples in the order given by columns
+        columns (Sequence[str], optional): Column names for tuple rows
+
+    Returns:
+        Tuple[List, List[Tuple[int, str]]]: The valid rows, and (row index, error)
+        pairs for every offending row
+    """
+    errors = {}
+    for name, accepted_types, allow_none in get_field_specs(schema):
+        column = get_column(rows, name, columns)
+        value_types = set(map(type, column))
+        has_bad_type = any(
+            not issubclass(value_type, accepted_types)
+            for value_type in value_types
+            if value_type is not type(None)
+        )
+        has_bad_null = not allow_none and type(None) in value_types
+        if not (has_bad_type or has_bad_null):
+            continue
+
+        for i, value in enumerate(column):
+            if value is None:
+                if not allow_none:
+                    errors.setdefault(i, []).append(
+                        f"{name}: none is not an allowed value"
+                    )
+            elif not isinstance(value, accepted_types):
+                errors.setdefault(i, []).append(
+                    f"{name}: expected {accepted_types[0].__name__}, got {type(value).__name__}"
+                )
+
+    valid_rows = [row for i, row in enumerate(rows) if i not in errors]
+    row_errors = [(i, "; ".join(messages)) for i, messages in sorted(errors.items())]
+    return valid_rows, row_errors
@@ -0,0 +1,48 @@
+"""
+Tests for the batch variants of the profiling functions that need no database.
+"""
+
+import pytest
+
+import app.profiling_funcs as profiling_funcs
+from app.scripts.pitch_snapshot import PITCH_COLUMNS
+
+
+@pytest.fixture
+def no_pitch_readers(monkeypatch):
+    def fail(filters, *args, **kwargs):
+        raise AssertionError(f"Pitches were read for {filters}")
+
+    monkeypatch.setattr(profiling_funcs, "read_snapshot_pitches", fail)
+    monkeypatch.setattr(profiling_funcs, "query_live_pitches", fail)
+
+
+def test_query_pitches_empty_list(no_pitch_readers):
+    # Neither reader is asked: Postgres can't type an empty list parameter
+    pitches_df = profiling_funcs.query_pitches({"season": 2024, "batter_id": []})
+
+    assert pitches_df.empty
+    assert pitches_df.index.name == "id"
+    assert list(pitches_df.columns) == [name for name in PITCH_COLUMNS if name != "id"]
+
+
+@pytest.mark.parametrize(
+    "function_name",
+    [
+        "get_pitchers_pitches",
+        "get_batters_pitches",
+        "get_pitchers_in_sz_data",
+        "get_pitchers_out_sz_data",
+        "get_pitchers_ab_breaking_ball_insights",
+        "get_batters_chase_rate",
+        "get_batters_pitch_location_breakdown",
+        "get_batters_strike_location_breakdown",
+        "get_batters_chased_pitch_location_breakdown",
+        "get_batters_first_strike_take_rate",
+    ],
+)
+def test_batch_functions_empty_ids(no_pitch_readers, function_name):
+    result = getattr(profiling_funcs, function_name)([], options=None)
+
+    for result_df in result if isinstance(result, tuple) else [result]:
+        assert result_df.empty
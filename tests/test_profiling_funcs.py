@@ -0,0 +1,289 @@
+"""
+Golden-output tests for the vectorized pitch annotations in profiling_funcs.
+
+Every case is checked against the row-wise implementations they replaced,
+kept below as the reference.
+"""
+
+import itertools
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.profiling_funcs import (
+    annotate_is_chasing_pitch,
+    annotate_pitch_location,
+    annotate_pitch_type,
+)
+from app.scripts import db_engine
+from app.scripts.constants import (
+    BREAKING_PITCH_CODES,
+    FASTBALL_PITCH_CODES,
+    OFFSPEED_PITCH_CODES,
+)
+from app.scripts.pitch_snapshot import BATTER_HAND_SQL
+
+
+# ************* ROW-WISE REFERENCE IMPLEMENTATIONS *************
+
+
+def reference_effective_batter_hand(row: pd.Series) -> str:
+    pitcher_hand = row["pitcher_hand"]
+    batter_hand = row["batter_hand"]
+    if batter_hand == "S":
+        batter_hand = "R" if pitcher_hand == "L" else "L"
+
+    return batter_hand
+
+
+def reference_is_chasing_pitch(row: pd.Series) -> bool:
+    px = float(row["px"])
+    pz = float(row["pz"])
+    zone = int(row["zone"])
+    sz_bottom = float(row["batter_sz_bottom"])
+    sz_top = float(row["batter_sz_top"])
+
+    if zone >= 1 and zone <= 9:
+        return False
+
+    return px < -1.12 or px > 1.12 or pz < sz_bottom - 0.42 or pz > sz_top + 0.42
+
+
+def reference_pitch_location(row: pd.Series) -> str:
+    pitch_location = []
+    batter_hand = row["batter_hand"]
+    sz_bottom = float(row["batter_sz_bottom"])
+    sz_top = float(row["batter_sz_top"])
+    sz_band_height = (sz_top - sz_bottom) / 3
+    zone = int(row["zone"])
+
+    if zone >= 1 and zone <= 9:
+        if zone in [1, 4, 7]:
+            pitch_location.append("I" if batter_hand == "R" else "O")
+        if zone in [2, 5, 8]:
+            pitch_location.append("M")
+        if zone in [3, 6, 9]:
+            pitch_location.append("O" if batter_hand == "R" else "I")
+
+        if zone in [1, 2, 3]:
+            pitch_location.append("U")
+        if zone in [4, 5, 6]:
+            pitch_location.append("M")
+        if zone in [7, 8, 9]:
+            pitch_location.append("D")
+    else:
+        up_threshold = sz_top - sz_band_height
+        down_threshold = sz_bottom + sz_band_height
+        inside_threshold = -0.25 if batter_hand == "R" else 0.25
+        outside_threshold = 0.25 if batter_hand == "R" else -0.25
+        px = float(row["px"])
+        pz = float(row["pz"])
+
+        if batter_hand == "R":
+            if px >= outside_threshold:
+                pitch_location.append("O")
+            elif px <= inside_threshold:
+                pitch_location.append("I")
+            else:
+                pitch_location.append("M")
+        else:
+            if px <= outside_threshold:
+                pitch_location.append("O")
+            elif px >= inside_threshold:
+                pitch_location.append("I")
+            else:
+                pitch_location.append("M")
+
+        if pz >= up_threshold:
+            pitch_location.append("U")
+        elif pz <= down_threshold:
+            pitch_location.append("D")
+        else:
+            pitch_location.append("M")
+
+    return "".join(pitch_location)
+
+
+def reference_pitch_type(row: pd.Series) -> str:
+    pitch_type_code = row["pitch_type_code"]
+    if pitch_type_code in BREAKING_PITCH_CODES:
+        return "BREAKING"
+    elif pitch_type_code in OFFSPEED_PITCH_CODES:
+        return "OFFSPEED"
+    elif pitch_type_code in FASTBALL_PITCH_CODES:
+        return "FASTBALL"
+    else:
+        return "UNKNOWN"
+
+
+# ************* CASES *************
+
+SZ_TOP = 3.4
+SZ_BOTTOM = 1.6
+SZ_BAND_HEIGHT = (SZ_TOP - SZ_BOTTOM) / 3
+
+
+def build_pitches(rows) -> pd.DataFrame:
+    # A non-default index, so results are checked to be aligned with it
+    pitches_df = pd.DataFrame(
+        rows, columns=["batter_hand", "zone", "px", "pz", "batter_sz_top"]
+    )
+    pitches_df["batter_sz_bottom"] = SZ_BOTTOM
+    pitches_df.index = pitches_df.index * 10 + 7
+    return pitches_df
+
+
+def expected(pitches_df: pd.DataFrame, reference) -> pd.Series:
+    return pitches_df.apply(reference, axis=1)
+
+
+def test_pitch_location_in_zone():
+    # Every zone, for each batter hand, wherever the pitch actually crossed
+    pitches_df = build_pitches(
+        [
+            (batter_hand, zone, px, pz, SZ_TOP)
+            for batter_hand, zone, px, pz in itertools.product(
+                ["R", "L"], range(1, 10), [-2.0, 0.0, 2.0], [0.5, 2.5, 4.5]
+            )
+        ]
+    )
+    result = annotate_pitch_location(pitches_df)
+
+    pd.testing.assert_series_equal(
+        result, expected(pitches_df, reference_pitch_location), check_dtype=False
+    )
+    assert result[pitches_df["zone"] == 5].eq("MM").all()
+    assert set(result) == {
+        f"{horizontal}{vertical}" for horizontal in "IMO" for vertical in "UMD"
+    }
+
+
+@pytest.mark.parametrize("zone", [0, 11, 12, 13, 14])
+def test_pitch_location_out_of_zone_thresholds(zone):
+    # Right at, just inside and just outside the +-0.25 px and band thresholds
+    px_values = [-0.26, -0.25, -0.24, 0.0, 0.24, 0.25, 0.26]
+    up_threshold = SZ_TOP - SZ_BAND_HEIGHT
+    down_threshold = SZ_BOTTOM + SZ_BAND_HEIGHT
+    pz_values = [
+        down_threshold - 0.01,
+        down_threshold,
+        down_threshold + 0.01,
+        up_threshold - 0.01,
+        up_threshold,
+        up_threshold + 0.01,
+    ]
+    pitches_df = build_pitches(
+        [
+            (batter_hand, zone, px, pz, SZ_TOP)
+            for batter_hand, px, pz in itertools.product(
+                ["R", "L"], px_values, pz_values
+            )
+        ]
+    )
+    result = annotate_pitch_location(pitches_df)
+
+    pd.testing.assert_series_equal(
+        result, expected(pitches_df, reference_pitch_location), check_dtype=False
+    )
+    inside_for_righty = (pitches_df["batter_hand"] == "R") & (pitches_df["px"] <= -0.25)
+    assert result[inside_for_righty].str.startswith("I").all()
+    assert result[pitches_df["pz"] == up_threshold].str.endswith("U").all()
+
+
+def test_is_chasing_pitch_edges():
+    # Right at, just inside and just outside the +-1.12 px and +-0.42 pz edges
+    px_values = [-1.13, -1.12, -1.11, 0.0, 1.11, 1.12, 1.13]
+    pz_values = [
+        SZ_BOTTOM - 0.43,
+        SZ_BOTTOM - 0.42,
+        SZ_BOTTOM - 0.41,
+        2.5,
+        SZ_TOP + 0.41,
+        SZ_TOP + 0.42,
+        SZ_TOP + 0.43,
+    ]
+    pitches_df = build_pitches(
+        [
+            ("R", zone, px, pz, SZ_TOP)
+            for zone, px, pz in itertools.product([5, 11, 14], px_values, pz_values)
+        ]
+    )
+    result = annotate_is_chasing_pitch(pitches_df)
+
+    pd.testing.assert_series_equal(
+        result, expected(pitches_df, reference_is_chasing_pitch), check_dtype=False
+    )
+    assert not result[pitches_df["zone"] == 5].any()
+    assert result[pitches_df["px"] == -1.13].sum() == 2 * len(pz_values)
+
+
+def test_pitch_type_codes():
+    codes = [
+        *BREAKING_PITCH_CODES,
+        *OFFSPEED_PITCH_CODES,
+        *FASTBALL_PITCH_CODES,
+        "XX",
+        "",
+        None,
+        np.nan,
+    ]
+    pitches_df = pd.DataFrame(
+        {"pitch_type_code": codes}, index=range(5, 5 + len(codes))
+    )
+    result = annotate_pitch_type(pitches_df)
+
+    pd.testing.assert_series_equal(
+        result, expected(pitches_df, reference_pitch_type), check_dtype=False
+    )
+    assert result.iloc[-4:].eq("UNKNOWN").all()
+
+
+def test_effective_batter_hand():
+    # The effective hand is computed in SQL by the pitch queries
+    hands = ["R", "L", "S", None]
+    cases = list(itertools.product(hands, hands))
+    query = text(
+        f"""
+        SELECT {BATTER_HAND_SQL}
+        FROM (
+            SELECT
+                CAST(:batter AS jsonb) AS details,
+                CAST(:pitcher AS jsonb) AS pitcher_details
+        ) batter
+        CROSS JOIN LATERAL (SELECT batter.pitcher_details AS details) pitcher
+        """
+    )
+    try:
+        with db_engine.connect() as connection:
+            result = [
+                connection.execute(
+                    query,
+                    {
+                        "batter": json.dumps(
+                            {"batSide": {"code": batter_hand}} if batter_hand else {}
+                        ),
+                        "pitcher": json.dumps(
+                            {"pitchHand": {"code": pitcher_hand}}
+                            if pitcher_hand
+                            else {}
+                        ),
+                    },
+                ).scalar()
+                for batter_hand, pitcher_hand in cases
+            ]
+    except OperationalError:
+        pytest.skip("No database to evaluate the pitch queries' SQL on")
+
+    reference = [
+        reference_effective_batter_hand(
+            pd.Series({"batter_hand": batter_hand, "pitcher_hand": pitcher_hand})
+        )
+        for batter_hand, pitcher_hand in cases
+    ]
+    assert result == reference
+    # A switch batter facing a pitcher with no known hand bats left
+    assert result[cases.index(("S", None))] == "L"